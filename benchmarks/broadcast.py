@@ -0,0 +1,51 @@
+"""Per-recipient request serialization cost in the broadcast send loop.
+
+Compares what aiogram does for every ``bot(method)`` call (copy the method,
+dump and serialize every field, url-encode the form) with the body prepared
+once by ``prepare_request``, where only chat_id is prepended per recipient.
+
+Usage: python -m benchmarks.broadcast [iterations]
+"""
+import sys
+import timeit
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.types import MessageEntity
+
+from bot.services.broadcast import compile_payload, prepare_request, request_body
+
+
+ENTITIES = [MessageEntity(type="bold", offset=0, length=6), MessageEntity(type="italic", offset=7, length=5)]
+PHOTO = {"type": "photo", "file_id": "AgACAgIAAxkBAAIB" * 4, "caption": "Привет, новый урок!", "caption_entities": ENTITIES}
+ALBUM = [
+    {"type": "video" if index % 2 else "photo", "file_id": f"file-{index}" * 8, "caption": "Альбом" if index == 0 else ""}
+    for index in range(10)
+]
+
+
+def _measure(label: str, func, iterations: int) -> float:
+    func()
+    seconds = timeit.timeit(func, number=iterations)
+    per_call_us = seconds / iterations * 1_000_000
+    print(f"{label:<40} {per_call_us:10.2f} us/recipient")
+    return per_call_us
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    bot = Bot(token="123456:benchmark-token", default=DefaultBotProperties(parse_mode="HTML", protect_content=True))
+    cases = [("photo with caption entities", compile_payload(PHOTO, [])), ("album of 10", compile_payload(None, ALBUM))]
+    for name, method in cases:
+        prepared = prepare_request(bot, method)
+        before = _measure(
+            f"{name} aiogram",
+            lambda: bot.session.build_form_data(bot, method.model_copy(update={"chat_id": 42}))(),
+            iterations,
+        )
+        after = _measure(f"{name} prepared", lambda: request_body(prepared, 42), iterations)
+        print(f"{'':<40} {before / after:10.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-render cost of inline keyboards with and without memoization.
+
+Usage: python -m benchmarks.keyboards [iterations]
+"""
+import sys
+import timeit
+
+from bot.keyboards import menu
+
+
+VIDEOS = [{"id": index, "title": f"Урок {index}: тестовое название", "file_id": f"file-{index}"} for index in range(1, 11)]
+SELECTED = [1, 3, 5, 7]
+
+
+def _measure(label: str, func, iterations: int) -> float:
+    func()
+    seconds = timeit.timeit(func, number=iterations)
+    per_call_us = seconds / iterations * 1_000_000
+    print(f"{label:<40} {per_call_us:10.2f} us/render")
+    return per_call_us
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    catalog = menu._catalog_key(VIDEOS)
+    mask = menu._selection_mask(catalog, SELECTED)
+    cases = [
+        (
+            "main_menu_kb",
+            lambda: menu.main_menu_kb.__wrapped__(is_admin=True),
+            lambda: menu.main_menu_kb(is_admin=True),
+        ),
+        (
+            "admin_panel_kb",
+            lambda: menu.admin_panel_kb.__wrapped__(),
+            lambda: menu.admin_panel_kb(),
+        ),
+        (
+            "my_videos_kb (10 videos)",
+            lambda: menu._my_videos_markup.__wrapped__(menu._catalog_key(VIDEOS)),
+            lambda: menu.my_videos_kb(VIDEOS),
+        ),
+        (
+            "purchase_selection_kb (10 videos)",
+            lambda: menu._purchase_selection_markup.__wrapped__(catalog, mask, 30),
+            lambda: menu.purchase_selection_kb(SELECTED, VIDEOS, 30),
+        ),
+    ]
+    for name, uncached, cached in cases:
+        before = _measure(f"{name} uncached", uncached, iterations)
+        after = _measure(f"{name} cached", cached, iterations)
+        print(f"{'':<40} {before / after:10.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
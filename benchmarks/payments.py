@@ -0,0 +1,147 @@
+"""End-to-end payment confirmation throughput against the local YooMoney fake.
+
+Creates N pending payments in a temporary database, marks a share of them as
+paid on the fake server and runs checker ticks until every paid one is
+confirmed. Reports time-to-confirmation and API calls per confirmed payment
+for each checker mode. The ``webhook`` mode confirms through signed HTTP
+notifications pushed by the fake instead of polling.
+
+Usage: python -m benchmarks.payments [--payments 200] [--paid 0.5]
+       [--modes label,history,webhook] [--latency-ms 50] [--error-rate 0.0]
+       [--noise 500] [--rate 20] [--concurrency 4] [--interval 1]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict
+
+from benchmarks.yoomoney_fake import FakeYooMoney, base_url
+from bot.db import repository
+from bot.db.database import Database
+from bot.db.schema import init_db
+from bot.services.payment_checks import PaymentCheckExecutor
+from bot.services.payments import check_pending_by_label, reconcile_from_history
+from bot.services.webhook import PaymentWebhook
+from bot.services.yoomoney import TransportConfig, YooMoneyClient
+
+
+class _RecordingBot:
+    """Stands in for aiogram.Bot: records when each user was notified."""
+
+    def __init__(self) -> None:
+        self.notified_at: Dict[int, float] = {}
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.notified_at.setdefault(chat_id, time.monotonic())
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        fake = FakeYooMoney(args.latency_ms, args.error_rate, args.noise)
+        runner = await fake.serve()
+        client = YooMoneyClient(
+            "bench-token",
+            "4100000000000000",
+            TransportConfig(retry_backoff_sec=0.05),
+            base_url=base_url(runner),
+        )
+        checks = PaymentCheckExecutor(client, max_concurrency=args.concurrency, rate_per_sec=args.rate)
+        config = SimpleNamespace(
+            check_payments_interval_sec=args.interval,
+            payment_hot_window_sec=300,
+            payment_max_check_interval_sec=1800,
+            payment_check_batch=200,
+        )
+        bot = _RecordingBot()
+        webhook = PaymentWebhook(bot, db, "bench-secret", "127.0.0.1", 0, "/notify")
+        try:
+            await db.start()
+            await init_db(db)
+            await repository.seed_videos(db, [""] * 10)
+            await repository.load_settings_cache(db)
+            await client.start()
+            if mode == "webhook":
+                await webhook.start()
+                host, port = webhook.address
+                fake.notify_url = f"http://{host}:{port}/notify"
+                fake.notify_secret = "bench-secret"
+
+            for index in range(args.payments):
+                await repository.create_payment(db, index + 1, f"bench-{index}", 100, [1], 30)
+            paid_users = random.Random(7).sample(range(1, args.payments + 1), int(args.payments * args.paid))
+            paid_at = {}
+            for user_id in paid_users:
+                fake.pay(f"bench-{user_id - 1}")
+                paid_at[user_id] = time.monotonic()
+            fake.requests.clear()
+
+            started = time.monotonic()
+            ticks = 0
+            while len(bot.notified_at) < len(paid_users) and ticks < args.max_ticks:
+                if mode == "webhook":
+                    await asyncio.sleep(0.01)
+                    if time.monotonic() - started > args.max_ticks * args.interval:
+                        break
+                    continue
+                if mode == "label":
+                    await check_pending_by_label(bot, db, checks, config)
+                else:
+                    await reconcile_from_history(bot, db, checks, overlap_sec=600)
+                ticks += 1
+                if len(bot.notified_at) < len(paid_users):
+                    await asyncio.sleep(args.interval)
+            elapsed = time.monotonic() - started
+        finally:
+            await fake.close()
+            await webhook.stop()
+            await client.close()
+            await runner.cleanup()
+            await db.close()
+
+    waits = sorted(bot.notified_at[user_id] - paid_at[user_id] for user_id in bot.notified_at)
+    calls = fake.requests["operation-history"]
+    confirmed = len(waits)
+    return {
+        "mode": mode,
+        "confirmed": f"{confirmed}/{len(paid_users)}",
+        "ticks": ticks,
+        "elapsed_s": elapsed,
+        "p50_s": statistics.median(waits) if waits else 0.0,
+        "p95_s": waits[int(len(waits) * 0.95) - 1] if waits else 0.0,
+        "api_calls": calls,
+        "calls_per_confirmed": calls / confirmed if confirmed else float("inf"),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--paid", type=float, default=0.5, help="share of payments that get paid")
+    parser.add_argument("--modes", default="label,history,webhook")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--noise", type=int, default=500, help="unrelated operations in the history")
+    parser.add_argument("--rate", type=float, default=20.0, help="API requests per second")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=1, help="seconds between checker ticks")
+    parser.add_argument("--max-ticks", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'confirmed':>10} {'ticks':>6} {'elapsed s':>10} {'p50 s':>8} {'p95 s':>8} {'calls':>7} {'calls/paid':>11}")
+    for mode in args.modes.split(","):
+        result = await run_mode(mode.strip(), args)
+        print(
+            f"{result['mode']:<8} {result['confirmed']:>10} {result['ticks']:>6} {result['elapsed_s']:>10.2f} "
+            f"{result['p50_s']:>8.2f} {result['p95_s']:>8.2f} {result['api_calls']:>7} "
+            f"{result['calls_per_confirmed']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+"""Local stand-in for the YooMoney endpoints used by the bot.
+
+Serves ``/quickpay/confirm.xml`` (opening a payment link records a successful
+deposit for its label) and ``/api/operation-history`` with ``label``,
+``type``, ``from``, ``records`` and ``start_record`` support. Latency, error
+rate and the number of unrelated background operations are configurable.
+With ``notify_url`` set every payment is also pushed as a signed HTTP
+notification, like YooMoney does for the webhook.
+
+Usage: python -m benchmarks.yoomoney_fake [--port 8765] [--latency-ms 50]
+       [--error-rate 0.0] [--noise 0] [--notify-url URL --notify-secret SECRET]
+Then point the bot at it with YOOMONEY_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from bot.services.webhook import notification_hash
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_iso(raw: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class FakeYooMoney:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        error_rate: float = 0.0,
+        noise: int = 0,
+        seed: int = 1,
+        notify_url: Optional[str] = None,
+        notify_secret: str = "",
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.notify_url = notify_url
+        self.notify_secret = notify_secret
+        self.requests: Counter = Counter()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._notifications: List[asyncio.Task] = []
+        self._random = random.Random(seed)
+        self._operations: List[dict] = []
+        self._next_id = 1
+        now = time.time()
+        for index in range(noise):
+            self._add_operation(f"noise-{index}", now - self._random.uniform(0, 3600))
+
+    def _add_operation(self, label: str, ts: float, status: str = "success") -> dict:
+        operation = {
+            "operation_id": str(self._next_id),
+            "status": status,
+            "datetime": _iso(ts),
+            "direction": "in",
+            "type": "deposition",
+            "amount": 100.0,
+            "label": label,
+            "_ts": ts,
+        }
+        self._next_id += 1
+        self._operations.append(operation)
+        return operation
+
+    def pay(self, label: str, ts: Optional[float] = None) -> None:
+        operation = self._add_operation(label, ts if ts is not None else time.time())
+        if self.notify_url:
+            self._notifications.append(asyncio.get_running_loop().create_task(self._notify(operation)))
+
+    async def _notify(self, operation: dict) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        await self._delay()
+        data = {
+            "notification_type": "p2p-incoming",
+            "operation_id": operation["operation_id"],
+            "amount": f"{operation['amount']:.2f}",
+            "withdraw_amount": f"{operation['amount']:.2f}",
+            "currency": "643",
+            "datetime": operation["datetime"],
+            "sender": "41001000040",
+            "codepro": "false",
+            "label": operation["label"],
+        }
+        data["sha1_hash"] = notification_hash(data, self.notify_secret)
+        async with self._session.post(self.notify_url, data=data) as resp:
+            self.requests[f"notify-{resp.status}"] += 1
+
+    async def close(self) -> None:
+        if self._notifications:
+            await asyncio.gather(*self._notifications, return_exceptions=True)
+            self._notifications = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _delay(self) -> None:
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    async def confirm(self, request: web.Request) -> web.Response:
+        self.requests["quickpay"] += 1
+        await self._delay()
+        label = request.query.get("label") or (await request.post()).get("label")
+        if label:
+            self.pay(str(label))
+        return web.Response(text="OK")
+
+    async def history(self, request: web.Request) -> web.Response:
+        self.requests["operation-history"] += 1
+        await self._delay()
+        if self._random.random() < self.error_rate:
+            return web.Response(status=503)
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.Response(status=401)
+        data = await request.post()
+        label = data.get("label")
+        since = _parse_iso(str(data["from"])) if data.get("from") else None
+        records = min(int(data.get("records", 30)), 100)
+        start = int(data.get("start_record", 0))
+
+        matched = [
+            operation
+            for operation in self._operations
+            if (label is None or operation["label"] == label)
+            and (since is None or operation["_ts"] >= since)
+        ]
+        matched.sort(key=lambda operation: operation["_ts"], reverse=True)
+        page = matched[start:start + records]
+        payload = {"operations": [{k: v for k, v in op.items() if not k.startswith("_")} for op in page]}
+        if start + records < len(matched):
+            payload["next_record"] = str(start + records)
+        return web.json_response(payload)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/quickpay/confirm.xml", self.confirm)
+        app.router.add_post("/api/operation-history", self.history)
+        return app
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return runner
+
+
+def base_url(runner: web.AppRunner) -> str:
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--noise", type=int, default=0)
+    parser.add_argument("--notify-url")
+    parser.add_argument("--notify-secret", default="")
+    args = parser.parse_args()
+    fake = FakeYooMoney(
+        args.latency_ms,
+        args.error_rate,
+        args.noise,
+        notify_url=args.notify_url,
+        notify_secret=args.notify_secret,
+    )
+    print(f"Fake YooMoney on http://{args.host}:{args.port}")
+    web.run_app(fake.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
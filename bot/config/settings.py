@@ -6,6 +6,9 @@ from typing import Dict, List
 from dotenv import load_dotenv
 
 
+EXPORT_FORMATS = ("xlsx", "csv")
+
+
 def _parse_admin_ids(raw: str) -> List[int]:
     if not raw:
         return []
@@ -60,14 +63,61 @@ class Settings:
     corporate_password: str
     offer_url: str
     db_url: str
+    db_pool_size: int
+    db_journal_mode: str
+    db_synchronous: str
+    db_mmap_size: int
+    db_cache_size_kb: int
+    db_temp_store: str
+    db_busy_timeout_ms: int
+    db_checkpoint_interval_sec: int
+    db_checkpoint_mode: str
+    catalog_cache_ttl_sec: int
+    settings_version_check_sec: int
     yoomoney_token: str
     yoomoney_wallet: str
+    yoomoney_base_url: str
     price_base: int
     price_coef: Dict[int, float]
     check_payments_interval_sec: int
-    delete_check_interval_sec: int
+    payment_check_mode: str
+    payment_history_overlap_sec: int
+    payment_safety_interval_sec: int
+    payment_kick_delay_sec: int
+    yoomoney_notify_secret: str
+    webhook_host: str
+    webhook_port: int
+    webhook_path: str
+    broadcast_rate_per_sec: float
+    broadcast_workers: int
+    broadcast_per_chat_interval_sec: float
+    broadcast_progress_interval_sec: float
+    broadcast_chunk_size: int
+    export_format: str
+    delete_concurrency: int
+    payment_ttl_sec: int
+    payment_hot_window_sec: int
+    payment_max_check_interval_sec: int
+    payment_check_batch: int
+    payment_check_concurrency: int
+    yoomoney_rate_per_sec: float
+    yoomoney_rate_burst: int
+    yoomoney_timeout_sec: float
+    yoomoney_connect_timeout_sec: float
+    yoomoney_read_timeout_sec: float
+    yoomoney_pool_limit: int
+    yoomoney_pool_limit_per_host: int
+    yoomoney_keepalive_sec: float
+    yoomoney_dns_ttl_sec: int
+    yoomoney_max_retries: int
+    yoomoney_retry_backoff_sec: float
+    yoomoney_breaker_threshold: int
+    yoomoney_breaker_reset_sec: float
     access_notify_days: int
     access_notify_interval_sec: int
+    access_notify_rate_per_sec: float
+    access_notify_concurrency: int
+    job_jitter_sec: float
     corporate_max_attempts: int
     corporate_block_minutes: int
     video_file_ids: List[str]
@@ -80,6 +130,10 @@ def load_settings() -> Settings:
     if not bot_token:
         raise ValueError("BOT_TOKEN is required")
 
+    export_format = os.getenv("EXPORT_FORMAT", "").strip().lower() or "xlsx"
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"EXPORT_FORMAT must be one of {', '.join(EXPORT_FORMATS)}, got {export_format!r}")
+
     admin_ids = _parse_admin_ids(os.getenv("ADMIN_IDS", ""))
     error_admin_id = _parse_int(
         os.getenv("ERROR_ADMIN_ID", ""),
@@ -100,14 +154,61 @@ def load_settings() -> Settings:
             "https://drive.google.com/file/d/1oCMl8gqP3j5e-EIA1Qz4ElwZfjxpuhdt/view?usp=sharing",
         ),
         db_url=os.getenv("DB_URL", "sqlite+aiosqlite:///./db.sqlite3"),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "4")),
+        db_journal_mode=os.getenv("DB_JOURNAL_MODE", "WAL"),
+        db_synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        db_mmap_size=int(os.getenv("DB_MMAP_SIZE", "268435456")),
+        db_cache_size_kb=int(os.getenv("DB_CACHE_SIZE_KB", "16384")),
+        db_temp_store=os.getenv("DB_TEMP_STORE", "MEMORY"),
+        db_busy_timeout_ms=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+        db_checkpoint_interval_sec=int(os.getenv("DB_CHECKPOINT_INTERVAL_SEC", "300")),
+        db_checkpoint_mode=os.getenv("DB_CHECKPOINT_MODE", "PASSIVE"),
+        catalog_cache_ttl_sec=int(os.getenv("CATALOG_CACHE_TTL_SEC", "300")),
+        settings_version_check_sec=int(os.getenv("SETTINGS_VERSION_CHECK_SEC", "0")),
         yoomoney_token=os.getenv("YOUMONEY_TOKEN", ""),
         yoomoney_wallet=os.getenv("YOUMONEY_WALLET", ""),
+        yoomoney_base_url=os.getenv("YOOMONEY_BASE_URL", "https://yoomoney.ru").strip().rstrip("/"),
         price_base=int(os.getenv("PRICE_BASE", "199")),
         price_coef=_parse_price_coef(os.getenv("PRICE_COEF_JSON", "")),
         check_payments_interval_sec=int(os.getenv("CHECK_PAYMENTS_INTERVAL_SEC", "10")),
-        delete_check_interval_sec=int(os.getenv("DELETE_CHECK_INTERVAL_SEC", "60")),
+        payment_check_mode=os.getenv("PAYMENT_CHECK_MODE", "history").strip().lower(),
+        payment_history_overlap_sec=int(os.getenv("PAYMENT_HISTORY_OVERLAP_SEC", "600")),
+        payment_safety_interval_sec=int(os.getenv("PAYMENT_SAFETY_INTERVAL_SEC", "300")),
+        payment_kick_delay_sec=int(os.getenv("PAYMENT_KICK_DELAY_SEC", "60")),
+        yoomoney_notify_secret=os.getenv("YOOMONEY_NOTIFY_SECRET", "").strip(),
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_path=os.getenv("WEBHOOK_PATH", "/yoomoney/notify"),
+        broadcast_rate_per_sec=float(os.getenv("BROADCAST_RATE_PER_SEC", "25")),
+        broadcast_workers=int(os.getenv("BROADCAST_WORKERS", "8")),
+        broadcast_per_chat_interval_sec=float(os.getenv("BROADCAST_PER_CHAT_INTERVAL_SEC", "1")),
+        broadcast_progress_interval_sec=float(os.getenv("BROADCAST_PROGRESS_INTERVAL_SEC", "5")),
+        broadcast_chunk_size=int(os.getenv("BROADCAST_CHUNK_SIZE", "200")),
+        export_format=export_format,
+        delete_concurrency=int(os.getenv("DELETE_CONCURRENCY", "8")),
+        payment_ttl_sec=int(os.getenv("PAYMENT_TTL_HOURS", "72")) * 3600,
+        payment_hot_window_sec=int(os.getenv("PAYMENT_HOT_WINDOW_SEC", "300")),
+        payment_max_check_interval_sec=int(os.getenv("PAYMENT_MAX_CHECK_INTERVAL_SEC", "1800")),
+        payment_check_batch=int(os.getenv("PAYMENT_CHECK_BATCH", "200")),
+        payment_check_concurrency=int(os.getenv("PAYMENT_CHECK_CONCURRENCY", "4")),
+        yoomoney_rate_per_sec=float(os.getenv("YOOMONEY_RATE_PER_SEC", "3")),
+        yoomoney_rate_burst=int(os.getenv("YOOMONEY_RATE_BURST", "5")),
+        yoomoney_timeout_sec=float(os.getenv("YOOMONEY_TIMEOUT_SEC", "15")),
+        yoomoney_connect_timeout_sec=float(os.getenv("YOOMONEY_CONNECT_TIMEOUT_SEC", "5")),
+        yoomoney_read_timeout_sec=float(os.getenv("YOOMONEY_READ_TIMEOUT_SEC", "10")),
+        yoomoney_pool_limit=int(os.getenv("YOOMONEY_POOL_LIMIT", "20")),
+        yoomoney_pool_limit_per_host=int(os.getenv("YOOMONEY_POOL_LIMIT_PER_HOST", "10")),
+        yoomoney_keepalive_sec=float(os.getenv("YOOMONEY_KEEPALIVE_SEC", "30")),
+        yoomoney_dns_ttl_sec=int(os.getenv("YOOMONEY_DNS_TTL_SEC", "300")),
+        yoomoney_max_retries=int(os.getenv("YOOMONEY_MAX_RETRIES", "2")),
+        yoomoney_retry_backoff_sec=float(os.getenv("YOOMONEY_RETRY_BACKOFF_SEC", "0.5")),
+        yoomoney_breaker_threshold=int(os.getenv("YOOMONEY_BREAKER_THRESHOLD", "5")),
+        yoomoney_breaker_reset_sec=float(os.getenv("YOOMONEY_BREAKER_RESET_SEC", "30")),
         access_notify_days=int(os.getenv("ACCESS_NOTIFY_DAYS", "2")),
         access_notify_interval_sec=int(os.getenv("ACCESS_NOTIFY_INTERVAL_SEC", "3600")),
+        access_notify_rate_per_sec=float(os.getenv("ACCESS_NOTIFY_RATE_PER_SEC", "20")),
+        access_notify_concurrency=int(os.getenv("ACCESS_NOTIFY_CONCURRENCY", "8")),
+        job_jitter_sec=float(os.getenv("JOB_JITTER_SEC", "1")),
         corporate_max_attempts=int(os.getenv("CORPORATE_MAX_ATTEMPTS", "5")),
         corporate_block_minutes=int(os.getenv("CORPORATE_BLOCK_MINUTES", "10")),
         video_file_ids=_load_video_file_ids(),
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+SETTINGS_VERSION_KEY = "_version"
+
+
+class CatalogCache:
+    """Whole video catalog kept in memory, reloaded after ``ttl_sec`` or ``invalidate()``."""
+
+    def __init__(self, ttl_sec: float = 300) -> None:
+        self.ttl_sec = ttl_sec
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._videos: Optional[List[dict]] = None
+        self._by_id: Dict[int, dict] = {}
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._logger = logging.getLogger("db.cache")
+
+    def _is_fresh(self) -> bool:
+        if self._videos is None:
+            return False
+        if self.ttl_sec <= 0:
+            return True
+        return time.monotonic() - self._loaded_at < self.ttl_sec
+
+    async def _load(self, loader: Callable[[], Awaitable[List[dict]]]) -> List[dict]:
+        if self._is_fresh():
+            self.hits += 1
+            return self._videos
+        async with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._videos
+            self.misses += 1
+            version = self.version
+            videos = await loader()
+            # Rows loaded while an invalidation happened are served but not kept.
+            if version == self.version:
+                self._videos = videos
+                self._by_id = {video["id"]: video for video in videos}
+                self._loaded_at = time.monotonic()
+                self._logger.debug("Catalog cache loaded videos=%s version=%s", len(videos), version)
+            return videos
+
+    async def videos(self, loader: Callable[[], Awaitable[List[dict]]]) -> List[dict]:
+        return list(await self._load(loader))
+
+    async def video(self, video_id: int, loader: Callable[[], Awaitable[List[dict]]]) -> Optional[dict]:
+        videos = await self._load(loader)
+        if videos is self._videos:
+            return self._by_id.get(video_id)
+        return next((video for video in videos if video["id"] == video_id), None)
+
+    def invalidate(self) -> None:
+        self._videos = None
+        self._by_id = {}
+        self.version += 1
+        self._logger.debug("Catalog cache invalidated version=%s", self.version)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "version": self.version}
+
+
+class SettingsCache:
+    """In-memory copy of the settings table, updated on write."""
+
+    def __init__(self, version_check_sec: float = 0) -> None:
+        # When positive, re-read the SETTINGS_VERSION_KEY stamp this often to see other processes' writes.
+        self.version_check_sec = version_check_sec
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._values: Optional[Dict[str, str]] = None
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._values is not None
+
+    def version_check_due(self) -> bool:
+        if self.version_check_sec <= 0:
+            return False
+        return time.monotonic() - self._checked_at >= self.version_check_sec
+
+    def mark_checked(self) -> None:
+        self._checked_at = time.monotonic()
+
+    def load(self, values: Dict[str, str]) -> None:
+        self.misses += 1
+        self._values = dict(values)
+        self.version = self._values.get(SETTINGS_VERSION_KEY)
+        self.mark_checked()
+
+    def get(self, key: str) -> Optional[str]:
+        self.hits += 1
+        return (self._values or {}).get(key)
+
+    def set(self, key: str, value: str, version: Optional[str]) -> None:
+        if self._values is None:
+            return
+        self._values[key] = value
+        self._values[SETTINGS_VERSION_KEY] = version
+        self.version = version
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "version": self.version}
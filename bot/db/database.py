@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
 import aiosqlite
 
 
@@ -13,35 +19,228 @@ def parse_db_path(db_url: str) -> str:
     return db_url
 
 
+_JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"}
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_TEMP_STORE_MODES = {"DEFAULT", "FILE", "MEMORY"}
+_CHECKPOINT_MODES = {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}
+
+
+def _choice(value: str, allowed: set[str], name: str) -> str:
+    normalized = value.strip().upper()
+    if normalized not in allowed:
+        raise ValueError(f"Unsupported {name}: {value}")
+    return normalized
+
+
+@dataclass
+class PragmaProfile:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 268435456
+    cache_size_kb: int = 16384
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+
+    def connection_pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}",
+            f"PRAGMA synchronous = {_choice(self.synchronous, _SYNCHRONOUS_MODES, 'synchronous')}",
+            f"PRAGMA cache_size = {-abs(int(self.cache_size_kb))}",
+            f"PRAGMA mmap_size = {int(self.mmap_size)}",
+            f"PRAGMA temp_store = {_choice(self.temp_store, _TEMP_STORE_MODES, 'temp_store')}",
+        ]
+
+    def journal_pragma(self) -> str:
+        return f"PRAGMA journal_mode = {_choice(self.journal_mode, _JOURNAL_MODES, 'journal_mode')}"
+
+
+class Transaction:
+    """Writer connection inside an open transaction, with the same query methods as Database."""
+
+    def __init__(self, conn: aiosqlite.Connection) -> None:
+        self._conn = conn
+
+    # Nested transaction() calls join the outer transaction.
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["Transaction"]:
+        yield self
+
+    async def execute(self, query: str, params: tuple = (), return_rowcount: bool = False) -> int | None:
+        cursor = await self._conn.execute(query, params)
+        rowcount = cursor.rowcount
+        await cursor.close()
+        if return_rowcount:
+            return rowcount
+        return None
+
+    async def executemany(self, query: str, params_list: list[tuple]) -> None:
+        cursor = await self._conn.executemany(query, params_list)
+        await cursor.close()
+
+    async def execute_returning(self, query: str, params: tuple = ()) -> list[dict]:
+        cursor = await self._conn.execute(query, params)
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return [dict(row) for row in rows]
+
+    async def fetchone(self, query: str, params: tuple = ()) -> dict | None:
+        cursor = await self._conn.execute(query, params)
+        row = await cursor.fetchone()
+        await cursor.close()
+        if row is None:
+            return None
+        return dict(row)
+
+    async def fetchall(self, query: str, params: tuple = ()) -> list[dict]:
+        cursor = await self._conn.execute(query, params)
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return [dict(row) for row in rows]
+
+
 class Database:
-    def __init__(self, db_url: str) -> None:
+    """One autocommit writer connection behind a lock and a pool of reader connections."""
+
+    def __init__(self, db_url: str, pool_size: int = 4, pragmas: Optional[PragmaProfile] = None) -> None:
         self.db_path = parse_db_path(db_url)
+        self.pool_size = max(1, pool_size)
+        self.pragmas = pragmas or PragmaProfile()
+        self.journal_mode: Optional[str] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue[aiosqlite.Connection]] = None
+        self._logger = logging.getLogger("db")
+
+    @property
+    def started(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self, **kwargs) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path, **kwargs)
+        conn.row_factory = aiosqlite.Row
+        for pragma in self.pragmas.connection_pragmas():
+            await conn.execute(pragma)
+        return conn
+
+    async def start(self) -> None:
+        if self._writer is not None:
+            return
+        self._writer = await self._connect(isolation_level=None)
+        cursor = await self._writer.execute(self.pragmas.journal_pragma())
+        row = await cursor.fetchone()
+        await cursor.close()
+        self.journal_mode = str(row[0]).upper() if row else None
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await self._connect()
+            self._readers.append(conn)
+            self._idle_readers.put_nowait(conn)
+        self._logger.info(
+            "Database started path=%s readers=%s journal_mode=%s",
+            self.db_path,
+            self.pool_size,
+            self.journal_mode,
+        )
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        async with self._write_lock:
+            for conn in self._readers:
+                await conn.close()
+            self._readers = []
+            self._idle_readers = None
+            await self._writer.close()
+            self._writer = None
+        self._logger.info("Database closed path=%s", self.db_path)
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> Optional[dict]:
+        if self.journal_mode != "WAL":
+            return None
+        checkpoint_mode = _choice(mode, _CHECKPOINT_MODES, "checkpoint mode")
+        async with self._write_lock:
+            db = self._require_writer()
+            cursor = await db.execute(f"PRAGMA wal_checkpoint({checkpoint_mode})")
+            row = await cursor.fetchone()
+            await cursor.close()
+        if row is None:
+            return None
+        return {"busy": row[0], "log_frames": row[1], "checkpointed_frames": row[2]}
+
+    def _require_writer(self) -> aiosqlite.Connection:
+        if self._writer is None:
+            raise RuntimeError("Database is not started")
+        return self._writer
+
+    async def _acquire_reader(self) -> aiosqlite.Connection:
+        if self._idle_readers is None:
+            raise RuntimeError("Database is not started")
+        return await self._idle_readers.get()
+
+    def _release_reader(self, conn: aiosqlite.Connection) -> None:
+        if self._idle_readers is not None:
+            self._idle_readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Transaction]:
+        async with self._write_lock:
+            db = self._require_writer()
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                yield Transaction(db)
+                await db.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT (busy, full disk) keeps the transaction open; later
+                # autocommit writes would silently join it, so always roll it back.
+                if db.in_transaction:
+                    await db.execute("ROLLBACK")
+                raise
 
     async def execute(self, query: str, params: tuple = (), return_rowcount: bool = False) -> int | None:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write_lock:
+            db = self._require_writer()
             cursor = await db.execute(query, params)
-            await db.commit()
-            if return_rowcount:
-                return cursor.rowcount
+            rowcount = cursor.rowcount
+            await cursor.close()
+        if return_rowcount:
+            return rowcount
         return None
 
     async def executemany(self, query: str, params_list: list[tuple]) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.executemany(query, params_list)
-            await db.commit()
+        async with self.transaction() as tx:
+            await tx.executemany(query, params_list)
 
-    async def fetchone(self, query: str, params: tuple = ()) -> dict | None:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def execute_returning(self, query: str, params: tuple = ()) -> list[dict]:
+        """Run a write statement with a RETURNING clause on the writer connection."""
+        async with self._write_lock:
+            db = self._require_writer()
             cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [dict(row) for row in rows]
+
+    async def fetchone(self, query: str, params: tuple = ()) -> dict | None:
+        conn = await self._acquire_reader()
+        try:
+            cursor = await conn.execute(query, params)
             row = await cursor.fetchone()
-            if row is None:
-                return None
-            return dict(row)
+            await cursor.close()
+        finally:
+            self._release_reader(conn)
+        if row is None:
+            return None
+        return dict(row)
 
     async def fetchall(self, query: str, params: tuple = ()) -> list[dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(query, params)
+        conn = await self._acquire_reader()
+        try:
+            cursor = await conn.execute(query, params)
             rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            await cursor.close()
+        finally:
+            self._release_reader(conn)
+        return [dict(row) for row in rows]
+
+
+Executor = Union[Database, Transaction]
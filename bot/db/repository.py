@@ -1,35 +1,66 @@
 import json
 import logging
-from typing import Iterable, List, Optional
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from bot.db.database import Database
-from bot.utils.time import add_days, now_ts
+from bot.db.cache import SETTINGS_VERSION_KEY, CatalogCache, SettingsCache
+from bot.db.database import Database, Executor
+from bot.db.schema import reconcile_stats
+from bot.utils.time import now_ts
 from bot.content_texts import LESSON_TITLES
 
 
-async def get_or_create_user(db: Database, user_id: int) -> dict:
+catalog_cache = CatalogCache()
+settings_cache = SettingsCache()
+
+
+@dataclass
+class UserContext:
+    user: dict
+    access: Dict[int, int]
+
+    @property
+    def is_corporate(self) -> bool:
+        return bool(self.user.get("is_corporate"))
+
+
+async def get_or_create_user(db: Executor, user_id: int) -> dict:
     logger = logging.getLogger("db.repository")
-    user = await db.fetchone("SELECT * FROM users WHERE id = ?", (user_id,))
-    if user:
-        return user
-    created_at = now_ts()
-    await db.execute(
-        "INSERT INTO users (id, created_at, is_corporate) VALUES (?, ?, 0)",
-        (user_id, created_at),
+    rows = await db.execute_returning(
+        "INSERT OR IGNORE INTO users (id, created_at, is_corporate) VALUES (?, ?, 0) RETURNING *",
+        (user_id, now_ts()),
     )
-    logger.info("Created user user_id=%s", user_id)
-    return {
-        "id": user_id,
-        "created_at": created_at,
-        "is_corporate": 0,
-        "corporate_unlocked_at": None,
-    }
+    if rows:
+        logger.info("Created user user_id=%s", user_id)
+        return rows[0]
+    return await get_user(db, user_id)
 
 
-async def get_user(db: Database, user_id: int) -> Optional[dict]:
+async def get_user(db: Executor, user_id: int) -> Optional[dict]:
     return await db.fetchone("SELECT * FROM users WHERE id = ?", (user_id,))
 
 
+async def load_user_context(db: Database, user_id: int) -> UserContext:
+    """Load the user row and active video access in one query, creating the user if missing."""
+    rows = await db.fetchall(
+        """
+        SELECT u.*, uva.video_id AS access_video_id, uva.access_until AS access_until
+        FROM users u
+        LEFT JOIN user_video_access uva ON uva.user_id = u.id AND uva.access_until > ?
+        WHERE u.id = ?
+        """,
+        (now_ts(), user_id),
+    )
+    if not rows:
+        user = await get_or_create_user(db, user_id)
+        return UserContext(user=user, access={})
+    user = {key: value for key, value in rows[0].items() if key not in {"access_video_id", "access_until"}}
+    access = {
+        row["access_video_id"]: row["access_until"] for row in rows if row["access_video_id"] is not None
+    }
+    return UserContext(user=user, access=access)
+
+
 async def set_user_corporate(db: Database, user_id: int) -> None:
     logger = logging.getLogger("db.repository")
     await db.execute(
@@ -54,46 +85,53 @@ async def set_user_corporate_status(db: Database, user_id: int, is_corporate: bo
     logger.info("Updated corporate status user_id=%s is_corporate=%s", user_id, is_corporate)
 
 
-async def seed_videos(db: Database, file_ids: List[str]) -> None:
+async def seed_videos(db: Executor, file_ids: List[str]) -> None:
     logger = logging.getLogger("db.repository")
-    for index in range(1, 11):
-        title = LESSON_TITLES[index - 1] if index - 1 < len(LESSON_TITLES) else f"Урок {index}"
-        file_id = file_ids[index - 1] if index - 1 < len(file_ids) else ""
-        existing = await db.fetchone("SELECT * FROM videos WHERE id = ?", (index,))
-        if existing is None:
-            await db.execute(
-                "INSERT INTO videos (id, title, file_id) VALUES (?, ?, ?)",
-                (index, title, file_id),
-            )
-            logger.info("Seeded video id=%s has_file_id=%s", index, bool(file_id))
-        else:
-            existing_title = (existing.get("title") or "").strip()
-            if existing_title in {"", f"Видео {index}", f"Урок {index}"}:
-                await db.execute(
-                    "UPDATE videos SET title = ? WHERE id = ?",
-                    (title, index),
+    async with db.transaction() as tx:
+        rows = await tx.fetchall("SELECT * FROM videos WHERE id BETWEEN 1 AND 10")
+        existing_by_id = {row["id"]: row for row in rows}
+        for index in range(1, 11):
+            title = LESSON_TITLES[index - 1] if index - 1 < len(LESSON_TITLES) else f"Урок {index}"
+            file_id = file_ids[index - 1] if index - 1 < len(file_ids) else ""
+            existing = existing_by_id.get(index)
+            if existing is None:
+                await tx.execute(
+                    "INSERT INTO videos (id, title, file_id) VALUES (?, ?, ?)",
+                    (index, title, file_id),
                 )
-                logger.info("Updated video title id=%s", index)
-            if file_id and file_id != (existing.get("file_id") or ""):
-                await db.execute(
-                    "UPDATE videos SET file_id = ? WHERE id = ?",
-                    (file_id, index),
-                )
-                logger.info("Updated video file_id id=%s", index)
+                logger.info("Seeded video id=%s has_file_id=%s", index, bool(file_id))
+            else:
+                existing_title = (existing.get("title") or "").strip()
+                if existing_title in {"", f"Видео {index}", f"Урок {index}"}:
+                    await tx.execute(
+                        "UPDATE videos SET title = ? WHERE id = ?",
+                        (title, index),
+                    )
+                    logger.info("Updated video title id=%s", index)
+                if file_id and file_id != (existing.get("file_id") or ""):
+                    await tx.execute(
+                        "UPDATE videos SET file_id = ? WHERE id = ?",
+                        (file_id, index),
+                    )
+                    logger.info("Updated video file_id id=%s", index)
+    catalog_cache.invalidate()
+
+
+async def _load_catalog(db: Database) -> List[dict]:
+    return await db.fetchall("SELECT * FROM videos ORDER BY id")
 
 
 async def get_video(db: Database, video_id: int) -> Optional[dict]:
-    return await db.fetchone("SELECT * FROM videos WHERE id = ?", (video_id,))
+    return await catalog_cache.video(video_id, lambda: _load_catalog(db))
 
 
 async def list_videos(db: Database) -> List[dict]:
-    return await db.fetchall("SELECT * FROM videos ORDER BY id")
+    return await catalog_cache.videos(lambda: _load_catalog(db))
 
 
 async def list_videos_for_sale(db: Database) -> List[dict]:
-    return await db.fetchall(
-        "SELECT * FROM videos WHERE file_id IS NOT NULL AND file_id != '' ORDER BY id"
-    )
+    videos = await catalog_cache.videos(lambda: _load_catalog(db))
+    return [video for video in videos if video.get("file_id")]
 
 
 async def get_next_video_id(db: Database) -> int:
@@ -110,20 +148,24 @@ async def add_video(db: Database, title: str, file_id: str) -> int:
         "INSERT INTO videos (id, title, file_id) VALUES (?, ?, ?)",
         (video_id, final_title, file_id),
     )
+    catalog_cache.invalidate()
     logger.info("Added video id=%s title=%s", video_id, final_title)
     return video_id
 
 
-async def delete_video(db: Database, video_id: int) -> None:
+async def delete_video(db: Executor, video_id: int) -> None:
     logger = logging.getLogger("db.repository")
-    await db.execute("DELETE FROM videos WHERE id = ?", (video_id,))
-    await db.execute("DELETE FROM user_video_access WHERE video_id = ?", (video_id,))
+    async with db.transaction() as tx:
+        await tx.execute("DELETE FROM videos WHERE id = ?", (video_id,))
+        await tx.execute("DELETE FROM user_video_access WHERE video_id = ?", (video_id,))
+    catalog_cache.invalidate()
     logger.info("Deleted video id=%s", video_id)
 
 
 async def update_video_file_id(db: Database, video_id: int, file_id: str) -> None:
     logger = logging.getLogger("db.repository")
     await db.execute("UPDATE videos SET file_id = ? WHERE id = ?", (file_id, video_id))
+    catalog_cache.invalidate()
     logger.info("Updated video file_id id=%s", video_id)
 
 
@@ -133,17 +175,13 @@ async def get_corporate_auth(db: Database, user_id: int) -> Optional[dict]:
 
 async def set_corporate_auth(db: Database, user_id: int, attempts: int, blocked_until: Optional[int]) -> None:
     logger = logging.getLogger("db.repository")
-    existing = await get_corporate_auth(db, user_id)
-    if existing is None:
-        await db.execute(
-            "INSERT INTO corporate_auth (user_id, attempts, blocked_until) VALUES (?, ?, ?)",
-            (user_id, attempts, blocked_until),
-        )
-    else:
-        await db.execute(
-            "UPDATE corporate_auth SET attempts = ?, blocked_until = ? WHERE user_id = ?",
-            (attempts, blocked_until, user_id),
-        )
+    await db.execute(
+        """
+        INSERT INTO corporate_auth (user_id, attempts, blocked_until) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET attempts = excluded.attempts, blocked_until = excluded.blocked_until
+        """,
+        (user_id, attempts, blocked_until),
+    )
     logger.debug(
         "Corporate auth updated user_id=%s attempts=%s blocked_until=%s",
         user_id,
@@ -161,23 +199,61 @@ async def reset_corporate_auth(db: Database, user_id: int) -> None:
     logger.debug("Corporate auth reset user_id=%s", user_id)
 
 
+async def load_settings_cache(db: Database) -> None:
+    rows = await db.fetchall("SELECT key, value FROM settings")
+    settings_cache.load({row["key"]: row["value"] for row in rows})
+    logging.getLogger("db.repository").debug(
+        "Settings cache loaded keys=%s version=%s",
+        len(rows),
+        settings_cache.version,
+    )
+
+
 async def get_setting(db: Database, key: str) -> Optional[str]:
-    row = await db.fetchone("SELECT value FROM settings WHERE key = ?", (key,))
-    if not row:
-        return None
-    return row.get("value")
+    if not settings_cache.loaded:
+        await load_settings_cache(db)
+    elif settings_cache.version_check_due():
+        row = await db.fetchone("SELECT value FROM settings WHERE key = ?", (SETTINGS_VERSION_KEY,))
+        settings_cache.mark_checked()
+        if (row["value"] if row else None) != settings_cache.version:
+            await load_settings_cache(db)
+    return settings_cache.get(key)
 
 
 async def set_setting(db: Database, key: str, value: str) -> None:
     logger = logging.getLogger("db.repository")
-    existing = await get_setting(db, key)
-    if existing is None:
-        await db.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, value))
-    else:
-        await db.execute("UPDATE settings SET value = ? WHERE key = ?", (value, key))
+    async with db.transaction() as tx:
+        await tx.execute(
+            "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+        rows = await tx.execute_returning(
+            """
+            INSERT INTO settings (key, value) VALUES (?, '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            RETURNING value
+            """,
+            (SETTINGS_VERSION_KEY,),
+        )
+    settings_cache.set(key, value, str(rows[0]["value"]))
     logger.info("Updated setting key=%s", key)
 
 
+async def get_cursor(db: Database, key: str) -> int:
+    """Read a sync cursor stored in the settings table, bypassing the settings cache."""
+    row = await db.fetchone("SELECT value FROM settings WHERE key = ?", (key,))
+    value = row["value"] if row else None
+    return int(value) if value and value.isdigit() else 0
+
+
+async def set_cursor(db: Database, key: str, value: int) -> None:
+    # Cursors move on every sweep: no version bump, so other processes keep their settings cache.
+    await db.execute(
+        "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, str(value)),
+    )
+
+
 async def get_setting_or_default(db: Database, key: str, default: str) -> str:
     value = await get_setting(db, key)
     if value is None or value.strip() == "":
@@ -185,16 +261,6 @@ async def get_setting_or_default(db: Database, key: str, default: str) -> str:
     return value
 
 
-async def get_access_until(db: Database, user_id: int, video_id: int) -> Optional[int]:
-    row = await db.fetchone(
-        "SELECT access_until FROM user_video_access WHERE user_id = ? AND video_id = ?",
-        (user_id, video_id),
-    )
-    if row is None:
-        return None
-    return row.get("access_until")
-
-
 async def list_accessible_video_ids(db: Database, user_id: int) -> List[int]:
     now = now_ts()
     rows = await db.fetchall(
@@ -217,6 +283,14 @@ async def list_accessible_videos(db: Database, user_id: int) -> List[dict]:
     )
 
 
+async def videos_for_access(db: Database, access: Dict[int, int]) -> List[dict]:
+    """Join an access map with the video catalog, shaped like list_accessible_videos."""
+    if not access:
+        return []
+    videos = await list_videos(db)
+    return [{**video, "access_until": access[video["id"]]} for video in videos if video["id"] in access]
+
+
 async def get_max_access_until(db: Database, user_id: int) -> Optional[int]:
     row = await db.fetchone(
         "SELECT MAX(access_until) AS max_until FROM user_video_access WHERE user_id = ?",
@@ -227,55 +301,65 @@ async def get_max_access_until(db: Database, user_id: int) -> Optional[int]:
     return row.get("max_until")
 
 
-async def get_notified_until(db: Database, user_id: int) -> Optional[int]:
-    row = await db.fetchone(
-        "SELECT notified_until FROM access_notifications WHERE user_id = ?",
-        (user_id,),
+async def list_expiring_access(db: Database, now: int, threshold: int) -> List[dict]:
+    """Users whose latest access ends in (now, threshold] and who were not told about that date yet."""
+    return await db.fetchall(
+        """
+        SELECT uva.user_id, MAX(uva.access_until) AS max_until
+        FROM user_video_access uva
+        JOIN users u ON u.id = uva.user_id AND u.is_blocked = 0
+        LEFT JOIN access_notifications an ON an.user_id = uva.user_id
+        WHERE uva.access_until > ? AND uva.access_until <= ?
+          AND NOT EXISTS (
+              SELECT 1 FROM user_video_access later
+              WHERE later.user_id = uva.user_id AND later.access_until > ?
+          )
+        GROUP BY uva.user_id
+        HAVING COALESCE(MAX(an.notified_until), 0) != MAX(uva.access_until)
+        """,
+        (now, threshold, threshold),
     )
-    if not row:
-        return None
-    return row.get("notified_until")
 
 
-async def set_notified_until(db: Database, user_id: int, notified_until: int) -> None:
+async def set_notified_until_many(db: Database, marks: List[Tuple[int, int]]) -> None:
     logger = logging.getLogger("db.repository")
-    existing = await get_notified_until(db, user_id)
-    if existing is None:
-        await db.execute(
-            "INSERT INTO access_notifications (user_id, notified_until) VALUES (?, ?)",
-            (user_id, notified_until),
-        )
-    else:
-        await db.execute(
-            "UPDATE access_notifications SET notified_until = ? WHERE user_id = ?",
-            (notified_until, user_id),
-        )
-    logger.info("Updated access notification user_id=%s notified_until=%s", user_id, notified_until)
+    if not marks:
+        return
+    await db.executemany(
+        """
+        INSERT INTO access_notifications (user_id, notified_until) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET notified_until = excluded.notified_until
+        """,
+        marks,
+    )
+    logger.info("Updated access notifications count=%s", len(marks))
 
 
-async def grant_access(db: Database, user_id: int, video_ids: Iterable[int], days: int = 30) -> None:
+async def grant_access(db: Executor, user_id: int, video_ids: Iterable[int], days: int = 30) -> Dict[int, int]:
+    """Extend access to all videos with one UPSERT and return video_id -> access_until."""
     logger = logging.getLogger("db.repository")
+    unique_ids = list(dict.fromkeys(int(video_id) for video_id in video_ids))
+    if not unique_ids:
+        return {}
     now = now_ts()
-    for video_id in video_ids:
-        existing = await get_access_until(db, user_id, video_id)
-        base_ts = max(now, existing or 0)
-        new_until = add_days(base_ts, days)
-        if existing is None:
-            await db.execute(
-                "INSERT INTO user_video_access (user_id, video_id, access_until) VALUES (?, ?, ?)",
-                (user_id, video_id, new_until),
-            )
-        else:
-            await db.execute(
-                "UPDATE user_video_access SET access_until = ? WHERE user_id = ? AND video_id = ?",
-                (new_until, user_id, video_id),
-            )
-        logger.info(
-            "Granted access user_id=%s video_id=%s access_until=%s",
-            user_id,
-            video_id,
-            new_until,
+    extension = days * 86400
+    placeholders = ", ".join("(?, ?, ?)" for _ in unique_ids)
+    params: list = []
+    for video_id in unique_ids:
+        params.extend((user_id, video_id, now + extension))
+    async with db.transaction() as tx:
+        rows = await tx.execute_returning(
+            f"""
+            INSERT INTO user_video_access (user_id, video_id, access_until) VALUES {placeholders}
+            ON CONFLICT(user_id, video_id) DO UPDATE
+            SET access_until = MAX(?, user_video_access.access_until) + ?
+            RETURNING video_id, access_until
+            """,
+            (*params, now, extension),
         )
+    access = {row["video_id"]: row["access_until"] for row in rows}
+    logger.info("Granted access user_id=%s access_until=%s", user_id, access)
+    return access
 
 
 async def create_payment(
@@ -291,10 +375,12 @@ async def create_payment(
     payload = json.dumps(selected_video_ids)
     await db.execute(
         """
-        INSERT INTO payments (user_id, label, amount, status, selected_video_ids, duration_days, created_at)
-        VALUES (?, ?, ?, 'pending', ?, ?, ?)
+        INSERT INTO payments (
+            user_id, label, amount, status, selected_video_ids, duration_days, created_at, next_check_at
+        )
+        VALUES (?, ?, ?, 'pending', ?, ?, ?, ?)
         """,
-        (user_id, label, amount, payload, duration_days, created_at),
+        (user_id, label, amount, payload, duration_days, created_at, created_at),
     )
     row = await db.fetchone("SELECT id FROM payments WHERE label = ?", (label,))
     logger.info(
@@ -312,8 +398,66 @@ async def get_payment(db: Database, payment_id: int) -> Optional[dict]:
     return await db.fetchone("SELECT * FROM payments WHERE id = ?", (payment_id,))
 
 
-async def get_pending_payments(db: Database) -> List[dict]:
-    return await db.fetchall("SELECT * FROM payments WHERE status = 'pending' ORDER BY created_at")
+async def get_payment_by_label(db: Database, label: str) -> Optional[dict]:
+    return await db.fetchone("SELECT * FROM payments WHERE label = ?", (label,))
+
+
+async def get_due_pending_payments(db: Database, now: int, limit: int) -> List[dict]:
+    return await db.fetchall(
+        "SELECT * FROM payments WHERE status = 'pending' AND next_check_at <= ? ORDER BY next_check_at LIMIT ?",
+        (now, limit),
+    )
+
+
+async def reschedule_payments(db: Database, schedule: List[tuple]) -> None:
+    """Set next_check_at for still-pending payments from (next_check_at, payment_id) pairs."""
+    if not schedule:
+        return
+    await db.executemany(
+        "UPDATE payments SET next_check_at = ? WHERE id = ? AND status = 'pending'",
+        schedule,
+    )
+
+
+async def set_payment_next_check(db: Database, payment_id: int, next_check_at: int) -> None:
+    await db.execute(
+        "UPDATE payments SET next_check_at = ? WHERE id = ? AND status = 'pending'",
+        (next_check_at, payment_id),
+    )
+
+
+async def expire_stale_payments(db: Database, created_before: int) -> int:
+    logger = logging.getLogger("db.repository")
+    rowcount = await db.execute(
+        "UPDATE payments SET status = 'expired' WHERE status = 'pending' AND created_at < ?",
+        (created_before,),
+        return_rowcount=True,
+    )
+    if rowcount:
+        logger.info("Expired pending payments count=%s created_before=%s", rowcount, created_before)
+    return int(rowcount or 0)
+
+
+async def get_oldest_pending_created_at(db: Database) -> Optional[int]:
+    row = await db.fetchone("SELECT MIN(created_at) AS min_created FROM payments WHERE status = 'pending'")
+    if not row:
+        return None
+    return row.get("min_created")
+
+
+async def get_unpaid_payments_by_labels(db: Database, labels: Iterable[str]) -> List[dict]:
+    label_list = list(labels)
+    if not label_list:
+        return []
+    placeholders = ", ".join("?" for _ in label_list)
+    return await db.fetchall(
+        f"""
+        SELECT * FROM payments
+        WHERE status IN ('pending', 'expired') AND label IN ({placeholders})
+        ORDER BY created_at
+        """,
+        tuple(label_list),
+    )
 
 
 async def get_pending_payment_for_user(db: Database, user_id: int) -> Optional[dict]:
@@ -323,10 +467,10 @@ async def get_pending_payment_for_user(db: Database, user_id: int) -> Optional[d
     )
 
 
-async def mark_payment_success(db: Database, payment_id: int, paid_at: int) -> bool:
+async def mark_payment_success(db: Executor, payment_id: int, paid_at: int) -> bool:
     logger = logging.getLogger("db.repository")
     rowcount = await db.execute(
-        "UPDATE payments SET status = 'success', paid_at = ? WHERE id = ? AND status = 'pending'",
+        "UPDATE payments SET status = 'success', paid_at = ? WHERE id = ? AND status IN ('pending', 'expired')",
         (paid_at, payment_id),
         return_rowcount=True,
     )
@@ -334,13 +478,25 @@ async def mark_payment_success(db: Database, payment_id: int, paid_at: int) -> b
     return bool(rowcount)
 
 
-async def add_sent_video(db: Database, user_id: int, chat_id: int, message_id: int, delete_after: int) -> None:
+async def confirm_payment(db: Executor, payment: dict, paid_at: int) -> Optional[Dict[int, int]]:
+    """Mark a pending payment paid and grant its videos; None if it was already processed."""
+    selected_ids = json.loads(payment["selected_video_ids"])
+    duration_days = int(payment.get("duration_days") or 30)
+    async with db.transaction() as tx:
+        updated = await mark_payment_success(tx, payment["id"], paid_at)
+        if not updated:
+            return None
+        return await grant_access(tx, payment["user_id"], selected_ids, days=duration_days)
+
+
+async def add_sent_video(db: Database, user_id: int, chat_id: int, message_id: int, delete_after: int) -> int:
     logger = logging.getLogger("db.repository")
     created_at = now_ts()
-    await db.execute(
+    rows = await db.execute_returning(
         """
         INSERT INTO sent_videos (user_id, chat_id, message_id, delete_after, created_at)
         VALUES (?, ?, ?, ?, ?)
+        RETURNING id
         """,
         (user_id, chat_id, message_id, delete_after, created_at),
     )
@@ -351,35 +507,167 @@ async def add_sent_video(db: Database, user_id: int, chat_id: int, message_id: i
         message_id,
         delete_after,
     )
+    return rows[0]["id"]
 
 
-async def list_due_sent_videos(db: Database, now: int) -> List[dict]:
-    return await db.fetchall(
-        "SELECT * FROM sent_videos WHERE delete_after <= ? ORDER BY delete_after",
-        (now,),
-    )
+async def list_sent_videos(db: Database) -> List[dict]:
+    return await db.fetchall("SELECT id, chat_id, message_id, delete_after FROM sent_videos")
 
 
-async def delete_sent_video(db: Database, record_id: int) -> None:
+async def delete_sent_videos(db: Database, record_ids: List[int]) -> None:
     logger = logging.getLogger("db.repository")
-    await db.execute("DELETE FROM sent_videos WHERE id = ?", (record_id,))
-    logger.debug("Deleted sent_video id=%s", record_id)
+    if not record_ids:
+        return
+    placeholders = ", ".join("?" for _ in record_ids)
+    await db.execute(f"DELETE FROM sent_videos WHERE id IN ({placeholders})", tuple(record_ids))
+    logger.debug("Deleted sent_videos count=%s", len(record_ids))
 
 
-async def list_users(db: Database) -> List[dict]:
-    return await db.fetchall("SELECT * FROM users ORDER BY created_at")
+async def set_users_blocked(db: Database, user_ids: Iterable[int], blocked: bool) -> None:
+    logger = logging.getLogger("db.repository")
+    ids = list(dict.fromkeys(user_ids))
+    if not ids:
+        return
+    await db.executemany(
+        "UPDATE users SET is_blocked = ? WHERE id = ?",
+        [(1 if blocked else 0, user_id) for user_id in ids],
+    )
+    logger.info("Set users blocked=%s count=%s", blocked, len(ids))
 
 
-async def list_payments(db: Database) -> List[dict]:
-    return await db.fetchall("SELECT * FROM payments ORDER BY created_at")
+async def count_broadcast_recipients(db: Database) -> int:
+    row = await db.fetchone("SELECT COUNT(*) AS cnt FROM users WHERE is_blocked = 0")
+    return int(row["cnt"]) if row else 0
 
 
-async def list_access(db: Database) -> List[dict]:
-    return await db.fetchall(
+async def create_broadcast_job(db: Database, admin_chat_id: int, payload: str, total: int) -> int:
+    logger = logging.getLogger("db.repository")
+    rows = await db.execute_returning(
         """
-        SELECT uva.user_id, uva.video_id, uva.access_until, v.title
-        FROM user_video_access uva
-        LEFT JOIN videos v ON v.id = uva.video_id
-        ORDER BY uva.user_id, uva.video_id
+        INSERT INTO broadcast_jobs (admin_chat_id, payload, status, total, created_at)
+        VALUES (?, ?, 'queued', ?, ?)
+        RETURNING id
+        """,
+        (admin_chat_id, payload, total, now_ts()),
+    )
+    job_id = rows[0]["id"]
+    logger.info("Created broadcast job id=%s total=%s", job_id, total)
+    return job_id
+
+
+async def activate_broadcast_job(db: Database, job_id: int, message_id: int) -> None:
+    """Attach the progress message and mark a queued job running, which makes it resumable."""
+    await db.execute(
+        "UPDATE broadcast_jobs SET progress_message_id = ?, status = 'running' WHERE id = ?",
+        (message_id, job_id),
+    )
+
+
+async def list_running_broadcast_jobs(db: Database) -> List[dict]:
+    return await db.fetchall("SELECT * FROM broadcast_jobs WHERE status = 'running' ORDER BY id")
+
+
+async def interrupt_broadcast_deliveries(db: Database, job_id: int) -> int:
+    """Mark sends that were in flight at a restart as interrupted; they are not retried."""
+    rowcount = await db.execute(
         """
+        UPDATE broadcast_deliveries SET status = 'interrupted', updated_at = ?
+        WHERE job_id = ? AND status = 'sending'
+        """,
+        (now_ts(), job_id),
+        return_rowcount=True,
+    )
+    return rowcount or 0
+
+
+async def claim_broadcast_chunk(
+    db: Database,
+    job_id: int,
+    after_user_id: int,
+    limit: int,
+) -> Tuple[List[int], Optional[int]]:
+    """Claim unrecorded recipients after ``after_user_id``; the cursor is None once all are claimed."""
+    async with db.transaction() as tx:
+        rows = await tx.fetchall(
+            "SELECT id FROM users WHERE id > ? AND is_blocked = 0 ORDER BY id LIMIT ?",
+            (after_user_id, limit),
+        )
+        if not rows:
+            return [], None
+        user_ids = [row["id"] for row in rows]
+        updated_at = now_ts()
+        params: List[int] = []
+        for user_id in user_ids:
+            params.extend((job_id, user_id, updated_at))
+        placeholders = ", ".join("(?, ?, 'sending', ?)" for _ in user_ids)
+        claimed = await tx.execute_returning(
+            f"""
+            INSERT INTO broadcast_deliveries (job_id, user_id, status, updated_at)
+            VALUES {placeholders}
+            ON CONFLICT(job_id, user_id) DO NOTHING
+            RETURNING user_id
+            """,
+            tuple(params),
+        )
+        cursor = user_ids[-1]
+        await tx.execute("UPDATE broadcast_jobs SET cursor = ? WHERE id = ?", (cursor, job_id))
+    return [row["user_id"] for row in claimed], cursor
+
+
+async def release_broadcast_claims(db: Database, job_id: int, user_ids: List[int], cursor: int) -> None:
+    """Delete claims that were never attempted and move the job cursor back before them."""
+    async with db.transaction() as tx:
+        await tx.executemany(
+            "DELETE FROM broadcast_deliveries WHERE job_id = ? AND user_id = ? AND status = 'sending'",
+            [(job_id, user_id) for user_id in user_ids],
+        )
+        await tx.execute("UPDATE broadcast_jobs SET cursor = ? WHERE id = ?", (cursor, job_id))
+
+
+async def record_broadcast_results(
+    db: Database,
+    job_id: int,
+    results: List[Tuple[int, str]],
+    sent: int,
+    failed: int,
+    blocked: int,
+) -> None:
+    updated_at = now_ts()
+    async with db.transaction() as tx:
+        if results:
+            await tx.executemany(
+                "UPDATE broadcast_deliveries SET status = ?, updated_at = ? WHERE job_id = ? AND user_id = ?",
+                [(status, updated_at, job_id, user_id) for user_id, status in results],
+            )
+            await tx.executemany(
+                "UPDATE users SET is_blocked = 1 WHERE id = ?",
+                [(user_id,) for user_id, status in results if status == "blocked"],
+            )
+        await tx.execute(
+            "UPDATE broadcast_jobs SET sent = ?, failed = ?, blocked = ? WHERE id = ?",
+            (sent, failed, blocked, job_id),
+        )
+
+
+async def finish_broadcast_job(db: Database, job_id: int, status: str) -> None:
+    await db.execute(
+        "UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE id = ?",
+        (status, now_ts(), job_id),
+    )
+
+
+async def get_stats(db: Database) -> Dict[str, int]:
+    """Counters kept by the stats triggers; rebuilt from the base tables if missing."""
+    rows = await db.fetchall("SELECT name, value FROM stats_counters")
+    if not rows:
+        await reconcile_stats(db)
+        rows = await db.fetchall("SELECT name, value FROM stats_counters")
+    return {row["name"]: int(row["value"]) for row in rows}
+
+
+async def count_active_access_users(db: Database, now: int) -> int:
+    row = await db.fetchone(
+        "SELECT COUNT(DISTINCT user_id) AS cnt FROM user_video_access WHERE access_until > ?",
+        (now,),
     )
+    return int(row["cnt"]) if row else 0
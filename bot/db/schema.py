@@ -1,8 +1,20 @@
-from bot.db.database import Database
+import logging
+from typing import Awaitable, Callable, List, Tuple
 
+from bot.db.database import Database, Executor, Transaction
+from bot.utils.time import now_ts
 
-async def init_db(db: Database) -> None:
-    await db.execute(
+
+Migration = Tuple[int, str, Callable[[Transaction], Awaitable[None]]]
+
+
+async def _column_exists(tx: Transaction, table: str, column: str) -> bool:
+    rows = await tx.fetchall(f"PRAGMA table_info({table})")
+    return any(row["name"] == column for row in rows)
+
+
+async def _m001_base_tables(tx: Transaction) -> None:
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY,
@@ -12,7 +24,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS videos (
             id INTEGER PRIMARY KEY,
@@ -21,7 +33,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS user_video_access (
             user_id INTEGER NOT NULL,
@@ -31,7 +43,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS payments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,11 +58,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    try:
-        await db.execute("ALTER TABLE payments ADD COLUMN duration_days INTEGER NOT NULL DEFAULT 30")
-    except Exception:
-        pass
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS sent_videos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -62,7 +70,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS corporate_auth (
             user_id INTEGER PRIMARY KEY,
@@ -71,7 +79,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
@@ -79,7 +87,7 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    await db.execute(
+    await tx.execute(
         """
         CREATE TABLE IF NOT EXISTS access_notifications (
             user_id INTEGER PRIMARY KEY,
@@ -87,7 +95,217 @@ async def init_db(db: Database) -> None:
         )
         """
     )
-    try:
-        await db.execute("ALTER TABLE access_notifications ADD COLUMN notified_until INTEGER NOT NULL")
-    except Exception:
-        pass
+
+
+async def _m002_legacy_columns(tx: Transaction) -> None:
+    # Databases created before duration_days/notified_until existed.
+    if not await _column_exists(tx, "payments", "duration_days"):
+        await tx.execute("ALTER TABLE payments ADD COLUMN duration_days INTEGER NOT NULL DEFAULT 30")
+    if not await _column_exists(tx, "access_notifications", "notified_until"):
+        await tx.execute("ALTER TABLE access_notifications ADD COLUMN notified_until INTEGER NOT NULL DEFAULT 0")
+
+
+async def _m003_query_indexes(tx: Transaction) -> None:
+    await tx.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_label ON payments (label)")
+    await tx.execute("CREATE INDEX IF NOT EXISTS idx_payments_status_created ON payments (status, created_at)")
+    await tx.execute(
+        "CREATE INDEX IF NOT EXISTS idx_payments_user_status_created ON payments (user_id, status, created_at)"
+    )
+    await tx.execute("CREATE INDEX IF NOT EXISTS idx_sent_videos_delete_after ON sent_videos (delete_after)")
+    await tx.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_video_access_user_until ON user_video_access (user_id, access_until)"
+    )
+    await tx.execute("CREATE INDEX IF NOT EXISTS idx_user_video_access_until ON user_video_access (access_until)")
+
+
+async def _m004_payment_schedule(tx: Transaction) -> None:
+    if not await _column_exists(tx, "payments", "next_check_at"):
+        await tx.execute("ALTER TABLE payments ADD COLUMN next_check_at INTEGER")
+    await tx.execute("UPDATE payments SET next_check_at = created_at WHERE next_check_at IS NULL")
+    await tx.execute(
+        "CREATE INDEX IF NOT EXISTS idx_payments_status_next_check ON payments (status, next_check_at)"
+    )
+
+
+async def _m005_user_blocked(tx: Transaction) -> None:
+    if not await _column_exists(tx, "users", "is_blocked"):
+        await tx.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER NOT NULL DEFAULT 0")
+
+
+async def _m006_broadcast_jobs(tx: Transaction) -> None:
+    await tx.execute(
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_chat_id INTEGER NOT NULL,
+            progress_message_id INTEGER,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL,
+            finished_at INTEGER
+        )
+        """
+    )
+    await tx.execute(
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (job_id, user_id)
+        ) WITHOUT ROWID
+        """
+    )
+    await tx.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)")
+
+
+def _counter_delta(name: str, delta: str) -> str:
+    return (
+        f"INSERT INTO stats_counters (name, value) VALUES ({name}, {delta}) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"
+    )
+
+
+STATS_TRIGGERS = {
+    "trg_stats_users_insert": f"""
+        AFTER INSERT ON users BEGIN
+            {_counter_delta("'users_total'", "1")}
+            {_counter_delta("'users_corporate'", "NEW.is_corporate != 0")}
+        END
+    """,
+    "trg_stats_users_delete": f"""
+        AFTER DELETE ON users BEGIN
+            {_counter_delta("'users_total'", "-1")}
+            {_counter_delta("'users_corporate'", "-(OLD.is_corporate != 0)")}
+        END
+    """,
+    "trg_stats_users_corporate": f"""
+        AFTER UPDATE OF is_corporate ON users
+        WHEN (OLD.is_corporate != 0) != (NEW.is_corporate != 0) BEGIN
+            {_counter_delta("'users_corporate'", "(NEW.is_corporate != 0) - (OLD.is_corporate != 0)")}
+        END
+    """,
+    "trg_stats_videos_insert": f"""
+        AFTER INSERT ON videos BEGIN
+            {_counter_delta("'videos_total'", "1")}
+            {_counter_delta("'videos_available'", "COALESCE(NEW.file_id, '') != ''")}
+        END
+    """,
+    "trg_stats_videos_delete": f"""
+        AFTER DELETE ON videos BEGIN
+            {_counter_delta("'videos_total'", "-1")}
+            {_counter_delta("'videos_available'", "-(COALESCE(OLD.file_id, '') != '')")}
+        END
+    """,
+    "trg_stats_videos_file": f"""
+        AFTER UPDATE OF file_id ON videos
+        WHEN (COALESCE(OLD.file_id, '') != '') != (COALESCE(NEW.file_id, '') != '') BEGIN
+            {_counter_delta("'videos_available'", "(COALESCE(NEW.file_id, '') != '') - (COALESCE(OLD.file_id, '') != '')")}
+        END
+    """,
+    "trg_stats_payments_insert": f"""
+        AFTER INSERT ON payments BEGIN
+            {_counter_delta("'payments_total'", "1")}
+            {_counter_delta("'payments_' || NEW.status", "1")}
+            {_counter_delta("'revenue'", "CASE WHEN NEW.status = 'success' THEN NEW.amount ELSE 0 END")}
+        END
+    """,
+    "trg_stats_payments_delete": f"""
+        AFTER DELETE ON payments BEGIN
+            {_counter_delta("'payments_total'", "-1")}
+            {_counter_delta("'payments_' || OLD.status", "-1")}
+            {_counter_delta("'revenue'", "-(CASE WHEN OLD.status = 'success' THEN OLD.amount ELSE 0 END)")}
+        END
+    """,
+    "trg_stats_payments_status": f"""
+        AFTER UPDATE OF status, amount ON payments
+        WHEN OLD.status IS NOT NEW.status OR OLD.amount IS NOT NEW.amount BEGIN
+            {_counter_delta("'payments_' || OLD.status", "-1")}
+            {_counter_delta("'payments_' || NEW.status", "1")}
+            {_counter_delta(
+                "'revenue'",
+                "(CASE WHEN NEW.status = 'success' THEN NEW.amount ELSE 0 END)"
+                " - (CASE WHEN OLD.status = 'success' THEN OLD.amount ELSE 0 END)",
+            )}
+        END
+    """,
+}
+
+
+async def _m007_stats_counters(tx: Transaction) -> None:
+    await tx.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    for name, body in STATS_TRIGGERS.items():
+        await tx.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    # Covers the active-access count, which depends on the current time.
+    await tx.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_video_access_until_user ON user_video_access (access_until, user_id)"
+    )
+    await tx.execute("DROP INDEX IF EXISTS idx_user_video_access_until")
+    await reconcile_stats(tx)
+
+
+async def reconcile_stats(db: Executor) -> None:
+    """Recompute every counter from the base tables in one statement."""
+    async with db.transaction() as tx:
+        await tx.execute("DELETE FROM stats_counters")
+        await tx.execute(
+            """
+            INSERT INTO stats_counters (name, value)
+            SELECT 'users_total', COUNT(*) FROM users
+            UNION ALL SELECT 'users_corporate', COALESCE(SUM(is_corporate != 0), 0) FROM users
+            UNION ALL SELECT 'videos_total', COUNT(*) FROM videos
+            UNION ALL SELECT 'videos_available', COALESCE(SUM(COALESCE(file_id, '') != ''), 0) FROM videos
+            UNION ALL SELECT 'payments_total', COUNT(*) FROM payments
+            UNION ALL SELECT 'revenue', COALESCE(SUM(CASE WHEN status = 'success' THEN amount ELSE 0 END), 0)
+                FROM payments
+            UNION ALL SELECT 'payments_' || status, COUNT(*) FROM payments GROUP BY status
+            """
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "base tables", _m001_base_tables),
+    (2, "legacy columns", _m002_legacy_columns),
+    (3, "query indexes", _m003_query_indexes),
+    (4, "payment check schedule", _m004_payment_schedule),
+    (5, "user blocked flag", _m005_user_blocked),
+    (6, "broadcast jobs", _m006_broadcast_jobs),
+    (7, "stats counters", _m007_stats_counters),
+]
+
+
+async def init_db(db: Database) -> None:
+    logger = logging.getLogger("db.schema")
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at INTEGER NOT NULL
+        )
+        """
+    )
+    for version, name, migrate in MIGRATIONS:
+        async with db.transaction() as tx:
+            applied = await tx.fetchone("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if applied:
+                continue
+            await migrate(tx)
+            await tx.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, now_ts()),
+            )
+        logger.info("Applied migration version=%s name=%s", version, name)
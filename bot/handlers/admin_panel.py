@@ -1,17 +1,14 @@
 import html
 import logging
 import os
-import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional
 
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 from aiogram.types.input_file import FSInputFile
-from openpyxl import Workbook
-from aiogram.types import InputMediaPhoto, InputMediaVideo
 
 from bot.config.settings import Settings
 from bot.db.database import Database
@@ -23,6 +20,8 @@ from bot.keyboards.menu import (
     admin_panel_kb,
     admin_videos_kb,
 )
+from bot.services.broadcast import BroadcastEngine
+from bot.services.exports import EXPORT_EXTENSIONS, EXPORTS, export_table
 from bot.utils.admin import is_admin
 from bot.utils.time import now_ts
 from bot.utils.cleanup import send_and_replace
@@ -40,26 +39,6 @@ class AdminPanelStates(StatesGroup):
     video_add_waiting = State()
 
 
-def _format_ts(ts: Any) -> str:
-    if not ts:
-        return ""
-    try:
-        return datetime.utcfromtimestamp(int(ts)).isoformat()
-    except Exception:
-        return str(ts)
-
-
-def _build_export_file(prefix: str, headers: list[str], rows: list[list[Any]]) -> str:
-    path = f"/tmp/{prefix}_{int(time.time())}.xlsx"
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.append(headers)
-    for row in rows:
-        sheet.append(row)
-    workbook.save(path)
-    return path
-
-
 def _broadcast_data_from_message(message: Message) -> Dict[str, Any] | None:
     if message.photo:
         photo = message.photo[-1]
@@ -90,25 +69,6 @@ def _broadcast_data_from_message(message: Message) -> Dict[str, Any] | None:
     return None
 
 
-def _build_media_group(items: List[Dict[str, Any]]) -> List[InputMediaPhoto | InputMediaVideo]:
-    media: List[InputMediaPhoto | InputMediaVideo] = []
-    caption_set = False
-    for item in items:
-        if item["type"] == "photo":
-            media_item = InputMediaPhoto(media=item["file_id"])
-        elif item["type"] == "video":
-            media_item = InputMediaVideo(media=item["file_id"])
-        else:
-            continue
-        if not caption_set and item.get("caption"):
-            media_item.caption = item["caption"]
-            if item.get("caption_entities"):
-                media_item.caption_entities = item["caption_entities"]
-            caption_set = True
-        media.append(media_item)
-    return media
-
-
 async def _ensure_admin(event: CallbackQuery | Message, config: Settings) -> bool:
     user_id = event.from_user.id
     if is_admin(user_id, config.admin_ids):
@@ -136,30 +96,27 @@ async def admin_stats(query: CallbackQuery, db: Database, config: Settings) -> N
         return
     logger.info("Admin stats requested user_id=%s", query.from_user.id)
 
-    total_users = await db.fetchone("SELECT COUNT(*) AS cnt FROM users")
-    corporate_users = await db.fetchone("SELECT COUNT(*) AS cnt FROM users WHERE is_corporate = 1")
-    active_access = await db.fetchone(
-        "SELECT COUNT(DISTINCT user_id) AS cnt FROM user_video_access WHERE access_until > ?",
-        (now_ts(),),
-    )
-    videos_total = await db.fetchone("SELECT COUNT(*) AS cnt FROM videos")
-    videos_available = await db.fetchone(
-        "SELECT COUNT(*) AS cnt FROM videos WHERE file_id IS NOT NULL AND file_id != ''"
-    )
-    payments_total = await db.fetchone("SELECT COUNT(*) AS cnt FROM payments")
-    payments_success = await db.fetchone("SELECT COUNT(*) AS cnt FROM payments WHERE status = 'success'")
-    payments_pending = await db.fetchone("SELECT COUNT(*) AS cnt FROM payments WHERE status = 'pending'")
+    stats = await repository.get_stats(db)
+    active_access = await repository.count_active_access_users(db, now_ts())
+    payments_total = stats.get("payments_total", 0)
+    payments_success = stats.get("payments_success", 0)
+    conversion = payments_success / payments_total * 100 if payments_total else 0.0
+    average_check = stats.get("revenue", 0) / payments_success if payments_success else 0
 
     message_text = (
         "Статистика бота:\n"
-        f"Пользователей всего: {total_users['cnt']}\n"
-        f"Корпоративных: {corporate_users['cnt']}\n"
-        f"С активным доступом: {active_access['cnt']}\n"
-        f"Видео в базе: {videos_total['cnt']}\n"
-        f"Видео доступно к продаже: {videos_available['cnt']}\n"
-        f"Платежей всего: {payments_total['cnt']}\n"
-        f"Платежей успешных: {payments_success['cnt']}\n"
-        f"Платежей в ожидании: {payments_pending['cnt']}"
+        f"Пользователей всего: {stats.get('users_total', 0)}\n"
+        f"Корпоративных: {stats.get('users_corporate', 0)}\n"
+        f"С активным доступом: {active_access}\n"
+        f"Видео в базе: {stats.get('videos_total', 0)}\n"
+        f"Видео доступно к продаже: {stats.get('videos_available', 0)}\n"
+        f"Платежей всего: {payments_total}\n"
+        f"Платежей успешных: {payments_success}\n"
+        f"Платежей в ожидании: {stats.get('payments_pending', 0)}\n"
+        f"Платежей просроченных: {stats.get('payments_expired', 0)}\n"
+        f"Выручка: {stats.get('revenue', 0)} руб.\n"
+        f"Средний чек: {average_check:.0f} руб.\n"
+        f"Конверсия в оплату: {conversion:.1f}%"
     )
     await send_and_replace(query.message, message_text, reply_markup=admin_panel_kb())
     await query.answer()
@@ -181,74 +138,20 @@ async def admin_export(query: CallbackQuery, db: Database, config: Settings) ->
 
     export_type = query.data.split(":")[2]
     logger.info("Admin export type=%s user_id=%s", export_type, query.from_user.id)
-    if export_type == "users":
-        users = await repository.list_users(db)
-        rows = [
-            [u["id"], _format_ts(u["created_at"]), u["is_corporate"], _format_ts(u.get("corporate_unlocked_at"))]
-            for u in users
-        ]
-        path = _build_export_file(
-            "users",
-            ["id", "created_at", "is_corporate", "corporate_unlocked_at"],
-            rows,
-        )
-    elif export_type == "payments":
-        payments = await repository.list_payments(db)
-        rows = [
-            [
-                p["id"],
-                p["user_id"],
-                p["label"],
-                p["amount"],
-                p["status"],
-                p["selected_video_ids"],
-                p.get("duration_days", 30),
-                _format_ts(p["created_at"]),
-                _format_ts(p.get("paid_at")),
-            ]
-            for p in payments
-        ]
-        path = _build_export_file(
-            "payments",
-            [
-                "id",
-                "user_id",
-                "label",
-                "amount",
-                "status",
-                "selected_video_ids",
-                "duration_days",
-                "created_at",
-                "paid_at",
-            ],
-            rows,
-        )
-    elif export_type == "access":
-        access_rows = await repository.list_access(db)
-        rows = [
-            [
-                row["user_id"],
-                row["video_id"],
-                row.get("title") or "",
-                _format_ts(row["access_until"]),
-            ]
-            for row in access_rows
-        ]
-        path = _build_export_file(
-            "access",
-            ["user_id", "video_id", "title", "access_until"],
-            rows,
-        )
-    else:
+    if export_type not in EXPORTS:
         await query.answer("Неизвестный экспорт")
         return
+    await query.answer("Готовлю файл...")
 
-    await query.message.answer_document(FSInputFile(path), reply_markup=admin_export_kb())
+    path = await export_table(db.db_path, export_type, config.export_format)
+    filename = f"{export_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXPORT_EXTENSIONS[config.export_format]}"
     try:
-        os.remove(path)
-    except OSError:
-        logger.warning("Failed to удалить экспортный файл %s", path)
-    await query.answer()
+        await query.message.answer_document(FSInputFile(path, filename=filename), reply_markup=admin_export_kb())
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            logger.warning("Failed to удалить экспортный файл %s", path)
 
 
 @router.callback_query(F.data == "admin:broadcast")
@@ -300,7 +203,7 @@ async def admin_broadcast_capture(message: Message, state: FSMContext, config: S
 @router.callback_query(AdminPanelStates.broadcast_confirm, F.data == "admin:confirm:broadcast")
 async def admin_broadcast_send(
     query: CallbackQuery,
-    db: Database,
+    broadcasts: BroadcastEngine,
     state: FSMContext,
     config: Settings,
 ) -> None:
@@ -314,44 +217,10 @@ async def admin_broadcast_send(
         await state.clear()
         return
 
-    users = await repository.list_users(db)
-    logger.info("Broadcast sending to %s users", len(users))
-    sent = 0
-    failed = 0
-    for user in users:
-        try:
-            if media_group_items:
-                media = _build_media_group(media_group_items)
-                await query.bot.send_media_group(user["id"], media)
-            elif payload["type"] == "text":
-                await query.bot.send_message(
-                    user["id"],
-                    payload["text"],
-                    entities=payload.get("entities") or None,
-                )
-            elif payload["type"] == "photo":
-                await query.bot.send_photo(
-                    user["id"],
-                    payload["file_id"],
-                    caption=payload.get("caption"),
-                    caption_entities=payload.get("caption_entities") or None,
-                )
-            elif payload["type"] == "video":
-                await query.bot.send_video(
-                    user["id"],
-                    payload["file_id"],
-                    caption=payload.get("caption"),
-                    caption_entities=payload.get("caption_entities") or None,
-                )
-            elif payload["type"] == "video_note":
-                await query.bot.send_video_note(user["id"], payload["file_id"])
-            sent += 1
-        except Exception:
-            failed += 1
-            logger.exception("Broadcast failed user_id=%s", user["id"])
-    logger.info("Broadcast finished sent=%s failed=%s", sent, failed)
+    job = await broadcasts.start_job(query.message.chat.id, payload, media_group_items)
+    logger.info("Broadcast job queued id=%s user_id=%s", job.id, query.from_user.id)
     await query.message.answer(
-        f"Рассылка завершена. Успешно: {sent}, ошибки: {failed}",
+        f"Рассылка #{job.id} запущена. Прогресс обновляется в сообщении выше.",
         reply_markup=admin_panel_kb(),
     )
     await state.clear()
@@ -23,9 +23,8 @@ class CorporateStates(StatesGroup):
 
 @router.callback_query(F.data == "menu:corporate")
 async def corporate_entry(query: CallbackQuery, db: Database, config: Settings, state: FSMContext) -> None:
-    await repository.get_or_create_user(db, query.from_user.id)
-    user = await repository.get_user(db, query.from_user.id)
-    if user and user.get("is_corporate"):
+    context = await repository.load_user_context(db, query.from_user.id)
+    if context.is_corporate:
         videos = await repository.list_videos(db)
         logger.info("Corporate menu access user_id=%s", query.from_user.id)
         await query.message.answer(
@@ -12,7 +12,9 @@ from bot.content_texts import LESSONS_LIST
 from bot.db.database import Database
 from bot.db import repository
 from bot.keyboards.menu import my_videos_kb, offer_kb, payment_kb, purchase_selection_kb
+from bot.services.payment_checks import PaymentCheckExecutor
 from bot.services.pricing import calculate_total
+from bot.services.scheduler import JobScheduler
 from bot.services.yoomoney import YooMoneyClient
 from bot.utils.time import now_ts
 from bot.utils.cleanup import send_and_replace
@@ -89,9 +91,8 @@ async def purchase_entry(
     config: Settings,
     state: FSMContext,
 ) -> None:
-    await repository.get_or_create_user(db, query.from_user.id)
-    user = await repository.get_user(db, query.from_user.id)
-    if user and user.get("is_corporate"):
+    context = await repository.load_user_context(db, query.from_user.id)
+    if context.is_corporate:
         await send_and_replace(
             query.message,
             "У вас корпоративный доступ. Покупка не требуется.",
@@ -185,6 +186,7 @@ async def offer_agree(
     config: Settings,
     state: FSMContext,
     yoomoney: YooMoneyClient,
+    scheduler: JobScheduler,
 ) -> None:
     data = await state.get_data()
     selected_list = data.get("pending_selected", [])
@@ -241,6 +243,10 @@ async def offer_agree(
         "Ссылка на оплату подготовлена. После оплаты нажмите кнопку проверки.",
         reply_markup=payment_kb(pay_url, payment_id),
     )
+    # Check shortly after the link is issued instead of waiting for the next regular pass;
+    # a reused payment may have backed off, so bring its own check forward as well.
+    await repository.set_payment_next_check(db, payment_id, now_ts() + config.payment_kick_delay_sec)
+    scheduler.trigger("payment_checker", delay_sec=config.payment_kick_delay_sec)
     await state.clear()
     await query.answer()
 
@@ -250,7 +256,7 @@ async def payment_check(
     query: CallbackQuery,
     db: Database,
     config: Settings,
-    yoomoney: YooMoneyClient,
+    payment_checks: PaymentCheckExecutor,
 ) -> None:
     try:
         payment_id = int(query.data.split(":")[2])
@@ -279,7 +285,7 @@ async def payment_check(
         query.from_user.id,
         payment["label"],
     )
-    is_paid = await yoomoney.check_payment(payment["label"])
+    is_paid = await payment_checks.check_payment(payment["label"])
     if not is_paid:
         await send_and_replace(
             query.message,
@@ -289,12 +295,10 @@ async def payment_check(
         return
 
     paid_at = now_ts()
-    updated = await repository.mark_payment_success(db, payment_id, paid_at)
-    if updated:
-        selected_ids = json.loads(payment["selected_video_ids"])
+    access = await repository.confirm_payment(db, payment, paid_at)
+    if access is not None:
         duration_days = int(payment.get("duration_days") or 30)
-        await repository.grant_access(db, payment["user_id"], selected_ids, days=duration_days)
-        videos = await repository.list_accessible_videos(db, payment["user_id"])
+        videos = await repository.videos_for_access(db, access)
         logging.getLogger("payment").info(
             "Payment confirmed manually id=%s user_id=%s",
             payment_id,
@@ -8,7 +8,7 @@ from aiogram.types import CallbackQuery, Message
 from bot.config.settings import Settings
 from bot.content_texts import WELCOME_SHORT_DESCRIPTION
 from bot.db.database import Database
-from bot.db.repository import get_or_create_user
+from bot.db.repository import get_or_create_user, set_users_blocked
 from bot.keyboards.menu import main_menu_kb
 from bot.utils.admin import is_admin
 from bot.utils.cleanup import send_and_replace
@@ -20,7 +20,10 @@ logger = logging.getLogger("handlers.start")
 @router.message(CommandStart())
 async def cmd_start(message: Message, db: Database, config: Settings, state: FSMContext) -> None:
     await state.clear()
-    await get_or_create_user(db, message.from_user.id)
+    user = await get_or_create_user(db, message.from_user.id)
+    if user and user.get("is_blocked"):
+        # Sending /start means the user unblocked the bot.
+        await set_users_blocked(db, [message.from_user.id], False)
     logger.info("Start command user_id=%s", message.from_user.id)
     if config.welcome_video_file_id:
         await message.answer_video(config.welcome_video_file_id)
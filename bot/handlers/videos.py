@@ -8,6 +8,7 @@ from bot.content_texts import LESSONS_LIST
 from bot.db.database import Database
 from bot.db import repository
 from bot.keyboards.menu import corporate_videos_kb, main_menu_only_kb, my_videos_kb
+from bot.services.deletion_queue import DeletionQueue
 from bot.services.video_sender import send_video_and_schedule
 from bot.utils.time import now_ts
 from bot.utils.cleanup import send_and_replace
@@ -18,9 +19,8 @@ logger = logging.getLogger("handlers.videos")
 
 @router.callback_query(F.data == "menu:my_videos")
 async def my_videos(query: CallbackQuery, db: Database, config: Settings) -> None:
-    await repository.get_or_create_user(db, query.from_user.id)
-    user = await repository.get_user(db, query.from_user.id)
-    if user and user.get("is_corporate"):
+    context = await repository.load_user_context(db, query.from_user.id)
+    if context.is_corporate:
         logger.info("My videos corporate user_id=%s", query.from_user.id)
         videos = await repository.list_videos(db)
         await query.message.answer("Корпоративный доступ активен. Все уроки доступны:")
@@ -32,7 +32,7 @@ async def my_videos(query: CallbackQuery, db: Database, config: Settings) -> Non
         await query.answer()
         return
 
-    accessible_videos = await repository.list_accessible_videos(db, query.from_user.id)
+    accessible_videos = await repository.videos_for_access(db, context.access)
     if not accessible_videos:
         logger.info("My videos empty user_id=%s", query.from_user.id)
         await query.message.answer(
@@ -59,16 +59,20 @@ async def my_videos(query: CallbackQuery, db: Database, config: Settings) -> Non
 
 
 @router.callback_query(F.data.startswith("video:"))
-async def open_video(query: CallbackQuery, db: Database, config: Settings) -> None:
+async def open_video(
+    query: CallbackQuery,
+    db: Database,
+    deletion_queue: DeletionQueue,
+    config: Settings,
+) -> None:
     try:
         video_id = int(query.data.split(":")[1])
     except (IndexError, ValueError):
         await query.answer("Некорректное видео")
         return
 
-    await repository.get_or_create_user(db, query.from_user.id)
-    user = await repository.get_user(db, query.from_user.id)
-    is_corporate = bool(user and user.get("is_corporate"))
+    context = await repository.load_user_context(db, query.from_user.id)
+    is_corporate = context.is_corporate
     logger.info(
         "Video request user_id=%s video_id=%s corporate=%s",
         query.from_user.id,
@@ -78,7 +82,7 @@ async def open_video(query: CallbackQuery, db: Database, config: Settings) -> No
 
     access_until = None
     if not is_corporate:
-        access_until = await repository.get_access_until(db, query.from_user.id, video_id)
+        access_until = context.access.get(video_id)
         if not access_until or access_until <= now_ts():
             logger.warning(
                 "Video access denied user_id=%s video_id=%s access_until=%s",
@@ -108,6 +112,7 @@ async def open_video(query: CallbackQuery, db: Database, config: Settings) -> No
     await send_video_and_schedule(
         bot=query.bot,
         db=db,
+        deletion_queue=deletion_queue,
         chat_id=query.message.chat.id,
         user_id=query.from_user.id,
         file_id=video["file_id"],
@@ -1,8 +1,15 @@
-from typing import List, Sequence
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+# Keyboards are memoized and the same InlineKeyboardMarkup instance is handed
+# out to every caller, so callers must treat them as read-only.
+KEYBOARD_CACHE_SIZE = 256
+
+CatalogKey = Tuple[Tuple[int, str], ...]
+
 
 def _video_title(video: dict) -> str:
     title = (video.get("title") or "").strip()
@@ -13,6 +20,20 @@ def _video_title(video: dict) -> str:
     return f"Урок {video.get('id')}"
 
 
+def _catalog_key(videos: Sequence[dict]) -> CatalogKey:
+    return tuple((video["id"], _video_title(video)) for video in videos)
+
+
+def _selection_mask(catalog: CatalogKey, selected_ids: Iterable[int]) -> int:
+    selected = set(selected_ids)
+    mask = 0
+    for position, (video_id, _) in enumerate(catalog):
+        if video_id in selected:
+            mask |= 1 << position
+    return mask
+
+
+@lru_cache(maxsize=2)
 def main_menu_kb(is_admin: bool = False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -34,12 +55,17 @@ def main_menu_kb(is_admin: bool = False) -> InlineKeyboardMarkup:
 
 
 def corporate_videos_kb(videos: Sequence[dict]) -> InlineKeyboardMarkup:
+    return _corporate_videos_markup(_catalog_key(videos))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _corporate_videos_markup(catalog: CatalogKey) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for video in videos:
+    for video_id, title in catalog:
         builder.add(
             InlineKeyboardButton(
-                text=_video_title(video),
-                callback_data=f"video:{video['id']}",
+                text=title,
+                callback_data=f"video:{video_id}",
             )
         )
     builder.adjust(2)
@@ -48,12 +74,17 @@ def corporate_videos_kb(videos: Sequence[dict]) -> InlineKeyboardMarkup:
 
 
 def my_videos_kb(videos: Sequence[dict]) -> InlineKeyboardMarkup:
+    return _my_videos_markup(_catalog_key(videos))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _my_videos_markup(catalog: CatalogKey) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for video in videos:
+    for video_id, title in catalog:
         builder.add(
             InlineKeyboardButton(
-                text=_video_title(video),
-                callback_data=f"video:{video['id']}",
+                text=title,
+                callback_data=f"video:{video_id}",
             )
         )
     builder.adjust(2)
@@ -70,18 +101,23 @@ def purchase_selection_kb(
     videos: Sequence[dict],
     duration_days: int,
 ) -> InlineKeyboardMarkup:
+    catalog = _catalog_key(videos)
+    return _purchase_selection_markup(catalog, _selection_mask(catalog, selected_ids), duration_days)
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _purchase_selection_markup(catalog: CatalogKey, selected_mask: int, duration_days: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for video in videos:
-        video_id = video["id"]
-        selected = video_id in selected_ids
+    for position, (video_id, title) in enumerate(catalog):
+        selected = bool(selected_mask >> position & 1)
         marker = "[x]" if selected else "[ ]"
         builder.add(
             InlineKeyboardButton(
-                text=f"{marker} {_video_title(video)}",
+                text=f"{marker} {title}",
                 callback_data=f"sel:toggle:{video_id}",
             )
         )
-    if videos:
+    if catalog:
         builder.adjust(2)
         builder.row(
             InlineKeyboardButton(text="Выбрать все", callback_data="sel:all"),
@@ -117,6 +153,7 @@ def payment_kb(pay_url: str, payment_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=4)
 def offer_kb(offer_url: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="Открыть оферту", url=offer_url))
@@ -128,12 +165,14 @@ def offer_kb(offer_url: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def main_menu_only_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="Главное меню", callback_data="menu:main"))
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def admin_panel_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -159,6 +198,7 @@ def admin_panel_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def admin_export_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -175,19 +215,25 @@ def admin_export_kb() -> InlineKeyboardMarkup:
 
 
 def admin_videos_kb(videos: Sequence[dict]) -> InlineKeyboardMarkup:
+    return _admin_videos_markup(_catalog_key(videos))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _admin_videos_markup(catalog: CatalogKey) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="Добавить видео", callback_data="admin:video:add"))
-    for video in videos:
+    for video_id, title in catalog:
         builder.row(
             InlineKeyboardButton(
-                text=f"Удалить {_video_title(video)}",
-                callback_data=f"admin:video:del:{video['id']}",
+                text=f"Удалить {title}",
+                callback_data=f"admin:video:del:{video_id}",
             )
         )
     builder.row(InlineKeyboardButton(text="Назад", callback_data="menu:admin"))
     return builder.as_markup()
 
 
+@lru_cache(maxsize=16)
 def admin_confirm_kb(action: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -198,12 +244,14 @@ def admin_confirm_kb(action: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def admin_cancel_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="Отмена", callback_data="admin:cancel"))
     return builder.as_markup()
 
 
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def before_after_kb(page: int, total: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     prev_page = max(1, page - 1)
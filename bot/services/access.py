@@ -1,5 +1,13 @@
-from typing import Optional
+import asyncio
+import logging
+from typing import List, Optional, Tuple
 
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from bot.db.database import Database
+from bot.db import repository
+from bot.utils.rate_limit import TokenBucket
 from bot.utils.time import now_ts
 
 
@@ -9,3 +17,50 @@ def compute_delete_after(access_until: Optional[int]) -> int:
     if access_until and access_until < default_delete:
         return access_until
     return default_delete
+
+
+async def notify_expiring_access(
+    bot: Bot,
+    db: Database,
+    bucket: TokenBucket,
+    concurrency: int,
+    notify_days: int,
+) -> int:
+    """Warn users whose access ends within ``notify_days`` and record who was told."""
+    logger = logging.getLogger("access_notify")
+    now = now_ts()
+    candidates = await repository.list_expiring_access(db, now, now + notify_days * 86400)
+    if not candidates:
+        return 0
+    logger.debug("Expiring access candidates count=%s", len(candidates))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    marks: List[Tuple[int, int]] = []
+    blocked: List[int] = []
+
+    async def notify(user_id: int, max_until: int) -> None:
+        remaining_days = max(0, int((max_until - now) / 86400) + 1)
+        async with semaphore:
+            for _ in range(2):
+                await bucket.acquire()
+                try:
+                    await bot.send_message(
+                        user_id,
+                        f"Доступ к урокам истекает через {remaining_days} дн. "
+                        "Чтобы продлить, выберите новые уроки в меню.",
+                    )
+                except TelegramRetryAfter as exc:
+                    await asyncio.sleep(exc.retry_after)
+                    continue
+                except TelegramForbiddenError:
+                    blocked.append(user_id)
+                    return
+                except Exception:
+                    logger.exception("Failed to notify user %s", user_id)
+                    return
+                marks.append((user_id, max_until))
+                return
+
+    await asyncio.gather(*(notify(row["user_id"], int(row["max_until"])) for row in candidates))
+    await repository.set_notified_until_many(db, marks)
+    await repository.set_users_blocked(db, blocked, True)
+    return len(marks)
@@ -0,0 +1,471 @@
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import urlencode
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMediaGroup, SendMessage, SendPhoto, SendVideo, SendVideoNote, TelegramMethod
+from aiogram.types import InputFile, InputMediaPhoto, InputMediaVideo, MessageEntity
+from aiohttp import ClientError
+from pydantic import BaseModel
+
+from bot.db.database import Database
+from bot.db import repository
+from bot.utils.rate_limit import TokenBucket
+
+
+STATUS_TEXTS = {
+    "queued": "готовится",
+    "running": "идет",
+    "finished": "завершена",
+    "paused": "приостановлена, продолжится после перезапуска",
+    "failed": "прервана с ошибкой",
+}
+
+
+# Three bound parameters per claimed row; stays under SQLite's 999-variable limit.
+MAX_CHUNK_SIZE = 300
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"Unsupported broadcast payload value: {value!r}")
+
+
+def encode_payload(payload: Optional[Dict[str, Any]], media_group_items: List[Dict[str, Any]]) -> str:
+    return json.dumps(
+        {"payload": payload, "media_group_items": media_group_items},
+        ensure_ascii=False,
+        default=_json_default,
+    )
+
+
+def _decode_item(item: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if item is None:
+        return None
+    decoded = dict(item)
+    for key in ("entities", "caption_entities"):
+        if decoded.get(key):
+            decoded[key] = [MessageEntity.model_validate(entity) for entity in decoded[key]]
+    return decoded
+
+
+def decode_payload(raw: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    data = json.loads(raw)
+    items = [_decode_item(item) for item in data.get("media_group_items") or []]
+    return _decode_item(data.get("payload")), items
+
+
+def build_media_group(items: List[Dict[str, Any]]) -> List[InputMediaPhoto | InputMediaVideo]:
+    media: List[InputMediaPhoto | InputMediaVideo] = []
+    caption_set = False
+    for item in items:
+        if item["type"] == "photo":
+            media_cls = InputMediaPhoto
+        elif item["type"] == "video":
+            media_cls = InputMediaVideo
+        else:
+            continue
+        # aiogram media models are frozen, so the caption goes in at construction.
+        caption_kwargs: Dict[str, Any] = {}
+        if not caption_set and item.get("caption"):
+            caption_kwargs["caption"] = item["caption"]
+            if item.get("caption_entities"):
+                caption_kwargs["caption_entities"] = item["caption_entities"]
+            caption_set = True
+        media.append(media_cls(media=item["file_id"], **caption_kwargs))
+    return media
+
+
+def compile_payload(
+    payload: Optional[Dict[str, Any]],
+    media_group_items: List[Dict[str, Any]],
+) -> TelegramMethod:
+    """Build the send request once; chat_id is filled in per recipient."""
+    if media_group_items:
+        return SendMediaGroup(chat_id=0, media=build_media_group(media_group_items))
+    payload_type = payload["type"] if payload else None
+    if payload_type == "text":
+        return SendMessage(chat_id=0, text=payload["text"], entities=payload.get("entities") or None)
+    if payload_type == "photo":
+        return SendPhoto(
+            chat_id=0,
+            photo=payload["file_id"],
+            caption=payload.get("caption"),
+            caption_entities=payload.get("caption_entities") or None,
+        )
+    if payload_type == "video":
+        return SendVideo(
+            chat_id=0,
+            video=payload["file_id"],
+            caption=payload.get("caption"),
+            caption_entities=payload.get("caption_entities") or None,
+        )
+    if payload_type == "video_note":
+        return SendVideoNote(chat_id=0, video_note=payload["file_id"])
+    raise ValueError(f"Unsupported broadcast payload type: {payload_type}")
+
+
+FORM_CONTENT_TYPE = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+@dataclass(frozen=True)
+class PreparedRequest:
+    method: TelegramMethod
+    # The url-encoded form aiogram would send, minus chat_id; None sends through bot(method).
+    body: Optional[bytes]
+
+
+def prepare_request(bot: Bot, method: TelegramMethod) -> PreparedRequest:
+    session = bot.session
+    if not isinstance(session, AiohttpSession):
+        return PreparedRequest(method, None)
+    files: Dict[str, InputFile] = {}
+    fields = []
+    for key, value in method.model_dump(warnings=False).items():
+        if key == "chat_id":
+            continue
+        value = session.prepare_value(value, bot=bot, files=files)
+        if value:
+            fields.append((key, value))
+    if files:
+        # Uploads go out as multipart per request; only file_id payloads are reused.
+        return PreparedRequest(method, None)
+    return PreparedRequest(method, urlencode(fields, doseq=True).encode())
+
+
+def request_body(request: PreparedRequest, chat_id: int) -> bytes:
+    return b"chat_id=%d&" % chat_id + request.body
+
+
+async def send_prepared(bot: Bot, request: PreparedRequest, chat_id: int) -> None:
+    """Same request and error handling as AiohttpSession.make_request, minus re-serializing the payload."""
+    if request.body is None:
+        await bot(request.method.model_copy(update={"chat_id": chat_id}))
+        return
+    session = bot.session
+    http = await session.create_session()
+    url = session.api.api_url(token=bot.token, method=request.method.__api_method__)
+    try:
+        async with http.post(
+            url,
+            data=request_body(request, chat_id),
+            headers=FORM_CONTENT_TYPE,
+            timeout=session.timeout,
+        ) as resp:
+            content = await resp.text()
+    except asyncio.TimeoutError as exc:
+        raise TelegramNetworkError(method=request.method, message="Request timeout error") from exc
+    except ClientError as exc:
+        raise TelegramNetworkError(method=request.method, message=f"{type(exc).__name__}: {exc}") from exc
+    session.check_response(bot=bot, method=request.method, status_code=resp.status, content=content)
+
+
+@dataclass
+class BroadcastJob:
+    id: int
+    admin_chat_id: int
+    payload: Optional[Dict[str, Any]]
+    media_group_items: List[Dict[str, Any]]
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    cursor: int = 0
+    status: str = "queued"
+    started_at: float = field(default_factory=time.monotonic)
+    progress_message_id: Optional[int] = None
+    request: Optional[PreparedRequest] = field(default=None, repr=False)
+    # Recipients of the current chunk whose send has started.
+    attempted: Set[int] = field(default_factory=set, repr=False)
+
+    @property
+    def message_cost(self) -> int:
+        # An album counts against the rate limit as one message per item.
+        return max(1, len(self.media_group_items))
+
+    def progress_text(self) -> str:
+        elapsed = int(time.monotonic() - self.started_at)
+        return (
+            f"Рассылка #{self.id}: {STATUS_TEXTS.get(self.status, self.status)}\n"
+            f"Отправлено: {self.sent} из {self.total}\n"
+            f"Ошибки: {self.failed}\n"
+            f"Заблокировали бота: {self.blocked}\n"
+            f"Время: {elapsed} с"
+        )
+
+
+class BroadcastEngine:
+    """Runs admin broadcasts as paced, resumable background jobs."""
+
+    RETRY_LIMIT = 3
+
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        rate_per_sec: float = 25.0,
+        workers: int = 8,
+        per_chat_interval_sec: float = 1.0,
+        progress_interval_sec: float = 5.0,
+        chunk_size: int = 200,
+    ) -> None:
+        self._bot = bot
+        self._db = db
+        self._workers = max(1, workers)
+        self._per_chat_interval_sec = per_chat_interval_sec
+        self._progress_interval_sec = progress_interval_sec
+        self._chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        self._target_rate = rate_per_sec
+        self._min_rate = max(1.0, rate_per_sec / 8) if rate_per_sec > 0 else 0.0
+        self._bucket = TokenBucket(rate_per_sec, max(rate_per_sec, 10.0))
+        self._slowed_until = 0.0
+        self._chat_next_at: Dict[int, float] = {}
+        self._jobs: Dict[int, BroadcastJob] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._logger = logging.getLogger("broadcast")
+
+    def get(self, job_id: int) -> Optional[BroadcastJob]:
+        return self._jobs.get(job_id)
+
+    async def start_job(
+        self,
+        admin_chat_id: int,
+        payload: Optional[Dict[str, Any]],
+        media_group_items: List[Dict[str, Any]],
+    ) -> BroadcastJob:
+        total = await repository.count_broadcast_recipients(self._db)
+        job_id = await repository.create_broadcast_job(
+            self._db,
+            admin_chat_id,
+            encode_payload(payload, media_group_items),
+            total,
+        )
+        job = BroadcastJob(job_id, admin_chat_id, payload, list(media_group_items), total=total)
+        try:
+            message = await self._bot.send_message(admin_chat_id, job.progress_text())
+        except BaseException:
+            # The row stays queued until the admin has seen the job, so resume() never starts it.
+            await repository.finish_broadcast_job(self._db, job_id, "failed")
+            raise
+        job.progress_message_id = message.message_id
+        await repository.activate_broadcast_job(self._db, job_id, message.message_id)
+        self._launch(job)
+        return job
+
+    async def resume(self) -> int:
+        """Restart jobs that were running when the bot stopped."""
+        rows = await repository.list_running_broadcast_jobs(self._db)
+        for row in rows:
+            interrupted = await repository.interrupt_broadcast_deliveries(self._db, row["id"])
+            payload, media_group_items = decode_payload(row["payload"])
+            job = BroadcastJob(
+                row["id"],
+                row["admin_chat_id"],
+                payload,
+                media_group_items,
+                total=row["total"],
+                sent=row["sent"],
+                failed=row["failed"] + interrupted,
+                blocked=row["blocked"],
+                cursor=row["cursor"],
+                progress_message_id=row["progress_message_id"],
+            )
+            self._logger.info(
+                "Resuming broadcast job id=%s cursor=%s interrupted=%s",
+                job.id,
+                job.cursor,
+                interrupted,
+            )
+            self._launch(job)
+        return len(rows)
+
+    def _launch(self, job: BroadcastJob) -> None:
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: BroadcastJob) -> None:
+        job.status = "running"
+        self._logger.info("Broadcast job running id=%s recipients=%s", job.id, job.total)
+        reporter = asyncio.create_task(self._report_progress(job))
+        try:
+            job.request = prepare_request(self._bot, compile_payload(job.payload, job.media_group_items))
+            while True:
+                # Recipients are recorded before sending and never retried after a restart:
+                # at most one delivery per user, even if a send was cut off mid-flight.
+                claim = asyncio.ensure_future(
+                    repository.claim_broadcast_chunk(self._db, job.id, job.cursor, self._chunk_size)
+                )
+                try:
+                    user_ids, cursor = await asyncio.shield(claim)
+                except asyncio.CancelledError:
+                    # The claim may still commit after we were cancelled; hand it back.
+                    try:
+                        user_ids, cursor = await claim
+                        if cursor is not None:
+                            await self._release_claims(job, user_ids, job.cursor)
+                    except Exception:
+                        self._logger.exception("Failed to release broadcast claim id=%s", job.id)
+                    raise
+                if cursor is None:
+                    break
+                job.cursor = cursor
+                await self._send_chunk(job, user_ids)
+            job.status = "finished"
+        except asyncio.CancelledError:
+            # Left as running in the database so resume() picks it up.
+            job.status = "paused"
+            raise
+        except Exception:
+            job.status = "failed"
+            self._logger.exception("Broadcast job failed id=%s", job.id)
+        finally:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
+            if job.status != "paused":
+                await repository.finish_broadcast_job(self._db, job.id, job.status)
+            await self._edit_progress(job)
+            self._logger.info(
+                "Broadcast job %s id=%s sent=%s failed=%s blocked=%s",
+                job.status,
+                job.id,
+                job.sent,
+                job.failed,
+                job.blocked,
+            )
+
+    async def _send_chunk(self, job: BroadcastJob, user_ids: List[int]) -> None:
+        results: List[Tuple[int, str]] = []
+        job.attempted = set()
+        chat_ids = iter(user_ids)
+        workers = [
+            asyncio.create_task(self._worker(job, chat_ids, results))
+            for _ in range(min(self._workers, len(user_ids)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            try:
+                await repository.record_broadcast_results(
+                    self._db,
+                    job.id,
+                    results,
+                    job.sent,
+                    job.failed,
+                    job.blocked,
+                )
+            except Exception:
+                self._logger.exception("Failed to record broadcast results id=%s", job.id)
+            recorded = {chat_id for chat_id, _ in results}
+            untried = [chat_id for chat_id in user_ids if chat_id not in recorded and chat_id not in job.attempted]
+            if untried:
+                try:
+                    await self._release_claims(job, untried, min(untried) - 1)
+                except Exception:
+                    self._logger.exception("Failed to release broadcast claims id=%s", job.id)
+
+    async def _release_claims(self, job: BroadcastJob, user_ids: List[int], cursor: int) -> None:
+        """Drop claims that were never sent and rewind the cursor so a resumed job retries them."""
+        await repository.release_broadcast_claims(self._db, job.id, user_ids, cursor)
+        job.cursor = cursor
+        self._logger.info("Released broadcast claims id=%s count=%s cursor=%s", job.id, len(user_ids), cursor)
+
+    async def _worker(self, job: BroadcastJob, chat_ids: Iterator[int], results: List[Tuple[int, str]]) -> None:
+        for chat_id in chat_ids:
+            result = await self._deliver(job, chat_id)
+            if result == "sent":
+                job.sent += 1
+            elif result == "blocked":
+                job.blocked += 1
+            else:
+                job.failed += 1
+            results.append((chat_id, result))
+
+    async def _deliver(self, job: BroadcastJob, chat_id: int) -> str:
+        for _ in range(self.RETRY_LIMIT):
+            await self._wait_for_chat(chat_id)
+            await self._bucket.acquire(job.message_cost)
+            job.attempted.add(chat_id)
+            try:
+                await self._send(job, chat_id)
+            except TelegramRetryAfter as exc:
+                self._slow_down(exc.retry_after)
+                await asyncio.sleep(exc.retry_after)
+                continue
+            except TelegramForbiddenError:
+                return "blocked"
+            except Exception:
+                self._logger.exception("Broadcast failed job_id=%s user_id=%s", job.id, chat_id)
+                return "failed"
+            self._speed_up()
+            return "sent"
+        self._logger.warning("Broadcast gave up after retries job_id=%s user_id=%s", job.id, chat_id)
+        return "failed"
+
+    async def _send(self, job: BroadcastJob, chat_id: int) -> None:
+        await send_prepared(self._bot, job.request, chat_id)
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        if self._per_chat_interval_sec <= 0:
+            return
+        now = time.monotonic()
+        next_at = self._chat_next_at.get(chat_id, 0.0)
+        self._chat_next_at[chat_id] = max(now, next_at) + self._per_chat_interval_sec
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    def _slow_down(self, retry_after: float) -> None:
+        now = time.monotonic()
+        # Workers that hit the same flood wait should halve the rate only once.
+        if now < self._slowed_until or self._bucket.rate <= 0:
+            return
+        self._slowed_until = now + retry_after
+        rate = max(self._min_rate, self._bucket.rate / 2)
+        self._bucket.set_rate(rate)
+        self._logger.warning("Telegram flood wait %ss, broadcast rate lowered to %.1f/s", retry_after, rate)
+
+    def _speed_up(self) -> None:
+        if 0 < self._bucket.rate < self._target_rate:
+            self._bucket.set_rate(min(self._target_rate, self._bucket.rate + self._target_rate / 100))
+
+    async def _report_progress(self, job: BroadcastJob) -> None:
+        while True:
+            await asyncio.sleep(self._progress_interval_sec)
+            now = time.monotonic()
+            self._chat_next_at = {chat_id: at for chat_id, at in self._chat_next_at.items() if at > now}
+            await self._edit_progress(job)
+
+    async def _edit_progress(self, job: BroadcastJob) -> None:
+        if job.progress_message_id is None:
+            return
+        try:
+            await self._bot.edit_message_text(
+                job.progress_text(),
+                chat_id=job.admin_chat_id,
+                message_id=job.progress_message_id,
+            )
+        except TelegramBadRequest as exc:
+            if "not modified" not in str(exc):
+                self._logger.warning("Failed to update broadcast progress id=%s: %s", job.id, exc)
+        except Exception:
+            self._logger.exception("Failed to update broadcast progress id=%s", job.id)
@@ -0,0 +1,174 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+
+from bot.db.database import Database
+from bot.db import repository
+from bot.utils.time import now_ts
+
+
+# (delete_after, sent_videos.id, chat_id, message_id, requeues)
+DeletionEntry = Tuple[int, int, int, int, int]
+
+# Bot API deleteMessages accepts at most 100 message ids per call.
+DELETE_BATCH_SIZE = 100
+RETRY_LIMIT = 3
+# Row ids per DELETE statement; below SQLite's 999 bound-variable limit.
+ROW_FLUSH_SIZE = 500
+# Messages that could not be deleted because of flood control or network errors
+# go back on the heap and are due again after this delay.
+REQUEUE_DELAY_SEC = 30
+# After this many requeues the row is dropped instead of retried forever.
+REQUEUE_LIMIT = 10
+
+
+class DeletionQueue:
+    """In-memory min-heap of pending deletions; ``sent_videos`` stays the source of truth."""
+
+    def __init__(self) -> None:
+        self._heap: List[DeletionEntry] = []
+        # Called when the earliest deadline moves closer, so the sleeping job recomputes its timeout.
+        self.on_earlier_deadline: Optional[Callable[[], None]] = None
+        self._loading = False
+        self._pushed_while_loading: List[DeletionEntry] = []
+        self._logger = logging.getLogger("deletion_queue")
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def load(self, db: Database) -> None:
+        self._loading = True
+        try:
+            rows = await repository.list_sent_videos(db)
+        finally:
+            self._loading = False
+        heap = [(row["delete_after"], row["id"], row["chat_id"], row["message_id"], 0) for row in rows]
+        known = {entry[1] for entry in heap}
+        heap.extend(entry for entry in self._pushed_while_loading if entry[1] not in known)
+        self._pushed_while_loading = []
+        heapq.heapify(heap)
+        self._heap = heap
+        self._notify()
+        self._logger.info("Deletion queue loaded pending=%s", len(heap))
+
+    def push(self, record_id: int, chat_id: int, message_id: int, delete_after: int, requeues: int = 0) -> None:
+        entry = (delete_after, record_id, chat_id, message_id, requeues)
+        if self._loading:
+            self._pushed_while_loading.append(entry)
+            return
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            # New earliest deadline: the sleeping job has to recompute its timeout.
+            self._notify()
+
+    def _notify(self) -> None:
+        if self.on_earlier_deadline is not None:
+            self.on_earlier_deadline()
+
+    def requeue(self, entries: List[DeletionEntry], delay_sec: int = REQUEUE_DELAY_SEC) -> List[DeletionEntry]:
+        """Push entries back with a delay and return the ones that hit ``REQUEUE_LIMIT``."""
+        retry_at = now_ts() + delay_sec
+        dropped: List[DeletionEntry] = []
+        for entry in entries:
+            _, record_id, chat_id, message_id, requeues = entry
+            if requeues >= REQUEUE_LIMIT:
+                dropped.append(entry)
+                continue
+            self.push(record_id, chat_id, message_id, retry_at, requeues + 1)
+        return dropped
+
+    def next_deadline(self) -> Optional[int]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: int) -> List[DeletionEntry]:
+        due: List[DeletionEntry] = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        return due
+
+
+async def _delete_batch(bot: Bot, chat_id: int, message_ids: List[int]) -> List[int]:
+    """Delete messages in one chat and return the ids worth trying again later."""
+    logger = logging.getLogger("delete_checker")
+    for _ in range(RETRY_LIMIT):
+        try:
+            await bot.delete_messages(chat_id, message_ids)
+            return []
+        except TelegramRetryAfter as exc:
+            await asyncio.sleep(exc.retry_after)
+        except (TelegramForbiddenError, TelegramNotFound) as exc:
+            # The bot was blocked or the chat is gone: none of these can be deleted.
+            logger.warning("Batch delete impossible chat=%s count=%s: %s", chat_id, len(message_ids), exc)
+            return []
+        except TelegramBadRequest as exc:
+            logger.debug("Batch delete rejected chat=%s count=%s: %s", chat_id, len(message_ids), exc)
+            break
+        except Exception as exc:
+            logger.warning("Batch delete failed chat=%s count=%s: %s", chat_id, len(message_ids), exc)
+            return message_ids
+    else:
+        logger.warning("Batch delete still flood limited chat=%s count=%s", chat_id, len(message_ids))
+        return message_ids
+    # Fall back to one call per message so a single bad id does not keep the rest.
+    retry_ids: List[int] = []
+    for message_id in message_ids:
+        try:
+            await bot.delete_message(chat_id, message_id)
+        except TelegramRetryAfter as exc:
+            await asyncio.sleep(exc.retry_after)
+            retry_ids.append(message_id)
+        except (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound):
+            # Already gone, too old or the chat is unreachable: nothing left to retry.
+            logger.warning("Failed to delete message %s in chat %s", message_id, chat_id)
+        except Exception:
+            retry_ids.append(message_id)
+    return retry_ids
+
+
+async def delete_due_messages(
+    bot: Bot,
+    db: Database,
+    entries: List[DeletionEntry],
+    concurrency: int,
+) -> List[DeletionEntry]:
+    """Delete messages in per-chat batches and return the entries to retry later."""
+    logger = logging.getLogger("delete_checker")
+    by_chat: Dict[int, List[DeletionEntry]] = defaultdict(list)
+    for entry in entries:
+        by_chat[entry[2]].append(entry)
+    batches = (
+        (chat_id, chat_entries[start:start + DELETE_BATCH_SIZE])
+        for chat_id, chat_entries in by_chat.items()
+        for start in range(0, len(chat_entries), DELETE_BATCH_SIZE)
+    )
+    done_ids: List[int] = []
+    retry: List[DeletionEntry] = []
+
+    async def flush() -> None:
+        record_ids = list(done_ids)
+        done_ids.clear()
+        await repository.delete_sent_videos(db, record_ids)
+
+    async def worker() -> None:
+        for chat_id, batch in batches:
+            try:
+                retry_ids = set(await _delete_batch(bot, chat_id, [entry[3] for entry in batch]))
+            except Exception:
+                logger.exception("Deletion batch failed chat=%s", chat_id)
+                retry_ids = {entry[3] for entry in batch}
+            for entry in batch:
+                if entry[3] in retry_ids:
+                    retry.append(entry)
+                else:
+                    done_ids.append(entry[1])
+            if len(done_ids) >= ROW_FLUSH_SIZE:
+                await flush()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    await flush()
+    return retry
@@ -0,0 +1,136 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+from openpyxl import Workbook
+
+
+def format_ts(ts: Any) -> str:
+    if not ts:
+        return ""
+    try:
+        return datetime.fromtimestamp(int(ts), tz=timezone.utc).replace(tzinfo=None).isoformat()
+    except Exception:
+        return str(ts)
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    headers: List[str]
+    query: str
+    # Indexes of columns holding unix timestamps, rendered as ISO dates.
+    ts_columns: Sequence[int] = ()
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "users": ExportSpec(
+        ["id", "created_at", "is_corporate", "corporate_unlocked_at"],
+        "SELECT id, created_at, is_corporate, corporate_unlocked_at FROM users ORDER BY created_at",
+        (1, 3),
+    ),
+    "payments": ExportSpec(
+        [
+            "id",
+            "user_id",
+            "label",
+            "amount",
+            "status",
+            "selected_video_ids",
+            "duration_days",
+            "created_at",
+            "paid_at",
+        ],
+        """
+        SELECT id, user_id, label, amount, status, selected_video_ids,
+               COALESCE(duration_days, 30), created_at, paid_at
+        FROM payments ORDER BY created_at
+        """,
+        (7, 8),
+    ),
+    "access": ExportSpec(
+        ["user_id", "video_id", "title", "access_until"],
+        """
+        SELECT uva.user_id, uva.video_id, COALESCE(v.title, ''), uva.access_until
+        FROM user_video_access uva
+        LEFT JOIN videos v ON v.id = uva.video_id
+        ORDER BY uva.user_id, uva.video_id
+        """,
+        (3,),
+    ),
+}
+
+EXPORT_EXTENSIONS = {"xlsx": ".xlsx", "csv": ".csv.gz"}
+
+
+def _iter_rows(db_path: str, spec: ExportSpec) -> Iterator[list]:
+    # A separate read-only connection; iterating the cursor streams rows from SQLite.
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for row in conn.execute(spec.query):
+            values = list(row)
+            for index in spec.ts_columns:
+                values[index] = format_ts(values[index])
+            yield values
+    finally:
+        conn.close()
+
+
+def _write_xlsx(path: str, spec: ExportSpec, rows: Iterator[list]) -> int:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(spec.headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def _write_csv_gz(path: str, spec: ExportSpec, rows: Iterator[list]) -> int:
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(spec.headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+WRITERS: Dict[str, Callable[[str, ExportSpec, Iterator[list]], int]] = {
+    "xlsx": _write_xlsx,
+    "csv": _write_csv_gz,
+}
+
+
+def build_export(db_path: str, export_type: str, export_format: str) -> str:
+    """Write one table to a temporary file and return its path. Blocking."""
+    logger = logging.getLogger("exports")
+    spec = EXPORTS[export_type]
+    writer = WRITERS[export_format]
+    fd, path = tempfile.mkstemp(prefix=f"{export_type}_", suffix=EXPORT_EXTENSIONS[export_format])
+    os.close(fd)
+    try:
+        count = writer(path, spec, _iter_rows(db_path, spec))
+    except BaseException:
+        os.remove(path)
+        raise
+    logger.info("Export written type=%s format=%s rows=%s path=%s", export_type, export_format, count, path)
+    return path
+
+
+async def export_table(db_path: str, export_type: str, export_format: str) -> str:
+    """Stream a table export in a worker thread so the event loop stays free."""
+    if export_type not in EXPORTS:
+        raise KeyError(export_type)
+    if export_format not in WRITERS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return await asyncio.to_thread(build_export, db_path, export_type, export_format)
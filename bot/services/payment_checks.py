@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bot.services.yoomoney import YooMoneyClient
+from bot.utils.rate_limit import TokenBucket
+
+
+class PaymentCheckExecutor:
+    """Runs YooMoney checks with bounded concurrency and a request rate limit."""
+
+    def __init__(
+        self,
+        yoomoney: YooMoneyClient,
+        max_concurrency: int = 4,
+        rate_per_sec: float = 3.0,
+        burst: Optional[float] = None,
+    ) -> None:
+        self._yoomoney = yoomoney
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(rate_per_sec, burst)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._logger = logging.getLogger("payment_checks")
+
+    @property
+    def enabled(self) -> bool:
+        return self._yoomoney.enabled
+
+    async def _run_check(self, label: str) -> bool:
+        async with self._semaphore:
+            return await self._yoomoney.check_payment(label, self._bucket)
+
+    def _forget(self, label: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(label) is task:
+            del self._in_flight[label]
+
+    async def check_payment(self, label: str) -> bool:
+        # A manual check and the background loop asking for one label share a request.
+        task = self._in_flight.get(label)
+        if task is None:
+            task = asyncio.create_task(self._run_check(label))
+            self._in_flight[label] = task
+            task.add_done_callback(lambda done: self._forget(label, done))
+        else:
+            self._logger.debug("Joining in-flight check label=%s", label)
+        # Shielded so a cancelled caller does not cancel a check others wait on.
+        return await asyncio.shield(task)
+
+    async def check_many(self, labels: Iterable[str]) -> Dict[str, bool]:
+        unique = list(dict.fromkeys(labels))
+        results = await asyncio.gather(*(self.check_payment(label) for label in unique))
+        return dict(zip(unique, results))
+
+    async def fetch_operations(self, since: str) -> Optional[Tuple[List[dict], bool]]:
+        # Every page and retry takes its own token, so a long sweep stays within the quota.
+        async with self._semaphore:
+            return await self._yoomoney.fetch_operations(since, limiter=self._bucket)
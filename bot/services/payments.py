@@ -0,0 +1,130 @@
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+from aiogram import Bot
+
+from bot.config.settings import Settings
+from bot.db.database import Database
+from bot.db import repository
+from bot.keyboards.menu import my_videos_kb
+from bot.services.payment_checks import PaymentCheckExecutor
+from bot.utils.time import now_ts
+
+
+HISTORY_CURSOR_KEY = "yoomoney_history_cursor"
+
+
+async def settle_payment(bot: Bot, db: Database, payment: dict) -> bool:
+    """Confirm a paid payment, grant access and notify the user."""
+    logger = logging.getLogger("payment_checker")
+    access = await repository.confirm_payment(db, payment, now_ts())
+    if access is None:
+        logger.warning("Payment already processed id=%s", payment["id"])
+        return False
+    logger.info("Payment confirmed id=%s user_id=%s", payment["id"], payment["user_id"])
+    duration_days = int(payment.get("duration_days") or 30)
+    videos = await repository.videos_for_access(db, access)
+    try:
+        await bot.send_message(
+            payment["user_id"],
+            f"Оплата подтверждена. Доступ к видео открыт на {duration_days} дней.",
+            reply_markup=my_videos_kb(videos),
+        )
+    except Exception:
+        logger.exception("Failed to notify user %s", payment["user_id"])
+    return True
+
+
+def next_check_delay(age_sec: int, base_sec: int, hot_window_sec: int, max_sec: int) -> int:
+    """Seconds until the next check: ``base_sec`` while hot, then doubling with age."""
+    if age_sec < hot_window_sec or hot_window_sec <= 0:
+        return base_sec
+    factor = 2 ** math.ceil(math.log2(age_sec / hot_window_sec))
+    return int(min(max_sec, base_sec * factor))
+
+
+async def expire_stale(db: Database, config: Settings) -> int:
+    return await repository.expire_stale_payments(db, now_ts() - config.payment_ttl_sec)
+
+
+async def check_pending_by_label(bot: Bot, db: Database, checks: PaymentCheckExecutor, config: Settings) -> int:
+    """Check pending payments that are due, each with its own operation-history request."""
+    logger = logging.getLogger("payment_checker")
+    now = now_ts()
+    due = await repository.get_due_pending_payments(db, now, config.payment_check_batch)
+    if not due:
+        return 0
+    logger.debug("Due pending payments count=%s", len(due))
+    results = await checks.check_many(payment["label"] for payment in due)
+    settled = 0
+    schedule = []
+    for payment in due:
+        if results.get(payment["label"]):
+            if await settle_payment(bot, db, payment):
+                settled += 1
+            continue
+        delay = next_check_delay(
+            now - int(payment["created_at"]),
+            config.check_payments_interval_sec,
+            config.payment_hot_window_sec,
+            config.payment_max_check_interval_sec,
+        )
+        schedule.append((now + delay, payment["id"]))
+    await repository.reschedule_payments(db, schedule)
+    return settled
+
+
+def _format_since(ts: int) -> str:
+    return datetime.fromtimestamp(max(ts, 0), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _operation_ts(operation: dict) -> Optional[int]:
+    raw = operation.get("datetime")
+    if not raw:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(raw).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+async def reconcile_from_history(
+    bot: Bot,
+    db: Database,
+    checks: PaymentCheckExecutor,
+    overlap_sec: int,
+) -> int:
+    """Settle pending payments from one operation-history sweep."""
+    logger = logging.getLogger("payment_checker")
+    oldest_pending = await repository.get_oldest_pending_created_at(db)
+    if oldest_pending is None:
+        return 0
+    cursor = await repository.get_cursor(db, HISTORY_CURSOR_KEY)
+    # Start at the newest operation seen last time, so API calls follow new operations, not pending payments.
+    since_ts = max(cursor, int(oldest_pending)) - overlap_sec
+    result = await checks.fetch_operations(_format_since(since_ts))
+    if result is None:
+        return 0
+    operations, complete = result
+
+    paid_labels = set()
+    newest = cursor
+    for operation in operations:
+        if operation.get("label") and operation.get("status") == "success":
+            paid_labels.add(operation["label"])
+        operation_ts = _operation_ts(operation)
+        if operation_ts and operation_ts > newest:
+            newest = operation_ts
+
+    settled = 0
+    if paid_labels:
+        payments = await repository.get_unpaid_payments_by_labels(db, paid_labels)
+        logger.debug("History sweep operations=%s matched=%s", len(operations), len(payments))
+        for payment in payments:
+            if await settle_payment(bot, db, payment):
+                settled += 1
+    if complete and newest > cursor:
+        await repository.set_cursor(db, HISTORY_CURSOR_KEY, newest)
+    return settled
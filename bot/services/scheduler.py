@@ -1,152 +1,343 @@
 import asyncio
-import json
+import bisect
 import logging
-from typing import List
+import random
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional
 
 from aiogram import Bot
 
 from bot.config.settings import Settings
 from bot.db.database import Database
 from bot.db import repository
-from bot.keyboards.menu import my_videos_kb
-from bot.services.yoomoney import YooMoneyClient
+from bot.services.access import notify_expiring_access
+from bot.services.deletion_queue import DeletionQueue, delete_due_messages
+from bot.services.payments import check_pending_by_label, expire_stale, reconcile_from_history
+from bot.services.payment_checks import PaymentCheckExecutor
+from bot.utils.rate_limit import TokenBucket
 from bot.utils.time import now_ts
 
 
-async def payment_checker_loop(
-    bot: Bot,
-    db: Database,
-    yoomoney: YooMoneyClient,
-    config: Settings,
-) -> None:
-    logger = logging.getLogger("payment_checker")
-    logger.info("Payment checker started interval=%ss", config.check_payments_interval_sec)
-    while True:
-        try:
-            pending = await repository.get_pending_payments(db)
-            if pending:
-                logger.debug("Pending payments count=%s", len(pending))
-            for payment in pending:
-                logger.debug(
-                    "Checking payment id=%s user_id=%s label=%s amount=%s",
-                    payment["id"],
-                    payment["user_id"],
-                    payment["label"],
-                    payment["amount"],
-                )
-                is_paid = await yoomoney.check_payment(payment["label"])
-                if not is_paid:
-                    continue
-                paid_at = now_ts()
-                updated = await repository.mark_payment_success(db, payment["id"], paid_at)
-                if not updated:
-                    logger.warning("Payment already processed id=%s", payment["id"])
-                    continue
-                logger.info("Payment confirmed id=%s user_id=%s", payment["id"], payment["user_id"])
-                selected_ids = json.loads(payment["selected_video_ids"])
-                duration_days = int(payment.get("duration_days") or 30)
-                await repository.grant_access(db, payment["user_id"], selected_ids, days=duration_days)
-                video_ids = await repository.list_accessible_videos(db, payment["user_id"])
+# Upper bounds (seconds) of the run-duration histogram buckets; the last bucket is open.
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DELETE_MAX_RUNTIME_SEC = 60.0
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    failures: int = 0
+    overruns: int = 0
+    skipped_ticks: int = 0
+    triggered: int = 0
+    last_sec: float = 0.0
+    max_sec: float = 0.0
+    total_sec: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+
+    def record(self, duration: float) -> None:
+        self.runs += 1
+        self.last_sec = duration
+        self.max_sec = max(self.max_sec, duration)
+        self.total_sec += duration
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+
+    def as_dict(self) -> dict:
+        labels = [f"<={bound:g}s" for bound in DURATION_BUCKETS] + [f">{DURATION_BUCKETS[-1]:g}s"]
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "triggered": self.triggered,
+            "last_sec": round(self.last_sec, 3),
+            "avg_sec": round(self.total_sec / self.runs, 3) if self.runs else 0.0,
+            "max_sec": round(self.max_sec, 3),
+            "histogram": {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[object]]
+    # Fixed-rate jobs set ``interval_sec``; deadline jobs set ``next_deadline``,
+    # which returns a unix timestamp or None when there is nothing to do.
+    interval_sec: Optional[float] = None
+    next_deadline: Optional[Callable[[], Optional[float]]] = None
+    jitter_sec: float = 0.0
+    max_runtime_sec: Optional[float] = None
+    stats: JobStats = field(default_factory=JobStats)
+    # Monotonic times: the fixed-rate tick (without jitter), its jittered due time
+    # and the earliest "run now" request.
+    tick_at: Optional[float] = None
+    due_at: Optional[float] = None
+    requested_at: Optional[float] = None
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class JobScheduler:
+    """Runs registered background jobs, one task per job; runs of a job never overlap."""
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._logger = logging.getLogger("scheduler")
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[object]],
+        *,
+        interval_sec: Optional[float] = None,
+        next_deadline: Optional[Callable[[], Optional[float]]] = None,
+        first_delay_sec: float = 0.0,
+        jitter_sec: float = 0.0,
+        max_runtime_sec: Optional[float] = None,
+    ) -> Job:
+        if name in self._jobs:
+            raise ValueError(f"Job already registered: {name}")
+        if (interval_sec is None) == (next_deadline is None):
+            raise ValueError("Job needs exactly one of interval_sec or next_deadline")
+        if interval_sec is not None and interval_sec <= 0:
+            raise ValueError("interval_sec must be positive")
+        job = Job(
+            name=name,
+            func=func,
+            interval_sec=interval_sec,
+            next_deadline=next_deadline,
+            jitter_sec=max(0.0, jitter_sec),
+            max_runtime_sec=max_runtime_sec,
+        )
+        if interval_sec is not None:
+            self._set_tick(job, time.monotonic() + first_delay_sec)
+        self._jobs[name] = job
+        if self._tasks:
+            self._spawn(job)
+        return job
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        for job in self._jobs.values():
+            if job.name not in self._tasks:
+                self._spawn(job)
+        self._logger.info("Scheduler started jobs=%s", ",".join(self._jobs))
+
+    def trigger(self, name: str, delay_sec: float = 0.0) -> None:
+        """Run the job now, or within ``delay_sec`` if it is not due earlier anyway."""
+        job = self._jobs[name]
+        run_at = time.monotonic() + max(0.0, delay_sec)
+        if job.requested_at is None or run_at < job.requested_at:
+            job.requested_at = run_at
+            job.stats.triggered += 1
+        job.wakeup.set()
+
+    def wake(self, name: str) -> None:
+        """Make a deadline job re-read its next deadline."""
+        job = self._jobs.get(name)
+        if job is not None:
+            job.wakeup.set()
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: job.stats.as_dict() for name, job in self._jobs.items()}
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks = {}
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._logger.info("Scheduler stopped metrics=%s", self.metrics())
+
+    def _spawn(self, job: Job) -> None:
+        self._tasks[job.name] = asyncio.create_task(self._run(job), name=f"job:{job.name}")
+
+    def _set_tick(self, job: Job, tick_at: float) -> None:
+        job.tick_at = tick_at
+        job.due_at = tick_at + random.uniform(0.0, job.jitter_sec)
+
+    def _next_due(self, job: Job) -> Optional[float]:
+        candidates = [job.requested_at]
+        if job.interval_sec is not None:
+            candidates.append(job.due_at)
+        else:
+            deadline = job.next_deadline()
+            if deadline is not None:
+                candidates.append(time.monotonic() + (deadline - time.time()) + job.jitter_sec)
+        pending = [value for value in candidates if value is not None]
+        return min(pending) if pending else None
+
+    async def _run(self, job: Job) -> None:
+        while True:
+            job.wakeup.clear()
+            due = self._next_due(job)
+            now = time.monotonic()
+            if due is None or due > now:
                 try:
-                    await bot.send_message(
-                        payment["user_id"],
-                        f"Оплата подтверждена. Доступ к видео открыт на {duration_days} дней.",
-                        reply_markup=my_videos_kb(video_ids),
-                    )
-                except Exception:
-                    logger.exception("Failed to notify user %s", payment["user_id"])
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            logger.exception("Payment checker loop failed")
-        await asyncio.sleep(config.check_payments_interval_sec)
+                    await asyncio.wait_for(job.wakeup.wait(), None if due is None else due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job.requested_at = None
+            if job.interval_sec is not None and job.due_at <= now:
+                self._advance(job, now)
+            await self._execute(job)
 
+    def _advance(self, job: Job, now: float) -> None:
+        # Fixed rate: ticks missed while a run overran are skipped, not replayed.
+        tick_at = job.tick_at + job.interval_sec
+        if tick_at <= now:
+            missed = int((now - tick_at) // job.interval_sec) + 1
+            job.stats.skipped_ticks += missed
+            tick_at += missed * job.interval_sec
+        self._set_tick(job, tick_at)
 
-async def delete_checker_loop(bot: Bot, db: Database, config: Settings) -> None:
-    logger = logging.getLogger("delete_checker")
-    logger.info("Delete checker started interval=%ss", config.delete_check_interval_sec)
-    while True:
+    async def _execute(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        watchdog = None
+        if job.max_runtime_sec:
+            watchdog = loop.call_later(
+                job.max_runtime_sec,
+                self._logger.warning,
+                "Job %s still running after %ss",
+                job.name,
+                job.max_runtime_sec,
+            )
+        started = time.monotonic()
         try:
-            now = now_ts()
-            due_records = await repository.list_due_sent_videos(db, now)
-            if due_records:
-                logger.debug("Messages due for deletion count=%s", len(due_records))
-            for record in due_records:
-                try:
-                    await bot.delete_message(record["chat_id"], record["message_id"])
-                except Exception:
-                    logger.warning(
-                        "Failed to delete message %s in chat %s",
-                        record["message_id"],
-                        record["chat_id"],
-                    )
-                await repository.delete_sent_video(db, record["id"])
+            await job.func()
         except asyncio.CancelledError:
             raise
         except Exception:
-            logger.exception("Delete checker loop failed")
-        await asyncio.sleep(config.delete_check_interval_sec)
+            job.stats.failures += 1
+            self._logger.exception("Job %s failed", job.name)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        duration = time.monotonic() - started
+        job.stats.record(duration)
+        if job.max_runtime_sec and duration > job.max_runtime_sec:
+            job.stats.overruns += 1
+            self._logger.warning(
+                "Job %s overran duration=%.2fs max=%ss",
+                job.name,
+                duration,
+                job.max_runtime_sec,
+            )
+
+
+async def check_payments(bot: Bot, db: Database, payment_checks: PaymentCheckExecutor, config: Settings) -> None:
+    await expire_stale(db, config)
+    if config.payment_check_mode == "history":
+        await reconcile_from_history(bot, db, payment_checks, config.payment_history_overlap_sec)
+    else:
+        await check_pending_by_label(bot, db, payment_checks, config)
 
 
-async def access_notify_loop(bot: Bot, db: Database, config: Settings) -> None:
+async def delete_due(bot: Bot, db: Database, deletion_queue: DeletionQueue, config: Settings) -> None:
+    logger = logging.getLogger("delete_checker")
+    due_records = deletion_queue.pop_due(now_ts())
+    if due_records:
+        logger.debug("Messages due for deletion count=%s", len(due_records))
+        retry = await delete_due_messages(bot, db, due_records, config.delete_concurrency)
+        if retry:
+            logger.warning("Deletions postponed count=%s", len(retry))
+            dropped = deletion_queue.requeue(retry)
+            if dropped:
+                logger.warning("Deletions abandoned after retries count=%s", len(dropped))
+                await repository.delete_sent_videos(db, [entry[1] for entry in dropped])
+
+
+async def notify_access(bot: Bot, db: Database, bucket: TokenBucket, config: Settings) -> None:
     logger = logging.getLogger("access_notify")
-    logger.info(
-        "Access notify started interval=%ss days=%s",
-        config.access_notify_interval_sec,
+    notified = await notify_expiring_access(
+        bot,
+        db,
+        bucket,
+        config.access_notify_concurrency,
         config.access_notify_days,
     )
-    while True:
-        try:
-            now = now_ts()
-            threshold = now + config.access_notify_days * 86400
-            rows = await db.fetchall(
-                """
-                SELECT user_id, MAX(access_until) AS max_until
-                FROM user_video_access
-                GROUP BY user_id
-                """
-            )
-            for row in rows:
-                user_id = row["user_id"]
-                max_until = row.get("max_until")
-                if not max_until or max_until <= now or max_until > threshold:
-                    continue
-                notified_until = await repository.get_notified_until(db, user_id)
-                if notified_until and int(notified_until) == int(max_until):
-                    continue
-                remaining_days = max(0, int((max_until - now) / 86400) + 1)
-                try:
-                    await bot.send_message(
-                        user_id,
-                        f"Доступ к урокам истекает через {remaining_days} дн. "
-                        "Чтобы продлить, выберите новые уроки в меню.",
-                    )
-                    await repository.set_notified_until(db, user_id, int(max_until))
-                except Exception:
-                    logger.exception("Failed to notify user %s", user_id)
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            logger.exception("Access notify loop failed")
-        await asyncio.sleep(config.access_notify_interval_sec)
+    if notified:
+        logger.info("Access expiry notifications sent count=%s", notified)
 
 
-def start_background_tasks(
+async def checkpoint_wal(db: Database, config: Settings) -> None:
+    logger = logging.getLogger("wal_checkpoint")
+    result = await db.checkpoint(config.db_checkpoint_mode)
+    if result:
+        logger.debug(
+            "WAL checkpoint busy=%s log_frames=%s checkpointed=%s",
+            result["busy"],
+            result["log_frames"],
+            result["checkpointed_frames"],
+        )
+
+
+async def start_background_tasks(
+    scheduler: JobScheduler,
     bot: Bot,
     db: Database,
-    yoomoney: YooMoneyClient,
+    payment_checks: PaymentCheckExecutor,
+    deletion_queue: DeletionQueue,
     config: Settings,
-) -> List[asyncio.Task]:
-    tasks = [
-        asyncio.create_task(payment_checker_loop(bot, db, yoomoney, config)),
-        asyncio.create_task(delete_checker_loop(bot, db, config)),
-        asyncio.create_task(access_notify_loop(bot, db, config)),
-    ]
-    return tasks
-
-
-async def stop_background_tasks(tasks: List[asyncio.Task]) -> None:
-    for task in tasks:
-        task.cancel()
-    if tasks:
-        await asyncio.gather(*tasks, return_exceptions=True)
+) -> None:
+    logger = logging.getLogger("scheduler")
+    # With notifications enabled polling only catches missed webhooks.
+    payment_interval = config.check_payments_interval_sec
+    if config.yoomoney_notify_secret:
+        payment_interval = config.payment_safety_interval_sec
+    scheduler.add_job(
+        "payment_checker",
+        partial(check_payments, bot, db, payment_checks, config),
+        interval_sec=payment_interval,
+        jitter_sec=config.job_jitter_sec,
+        max_runtime_sec=payment_interval,
+    )
+
+    await deletion_queue.load(db)
+    scheduler.add_job(
+        "delete_checker",
+        partial(delete_due, bot, db, deletion_queue, config),
+        next_deadline=deletion_queue.next_deadline,
+        max_runtime_sec=DELETE_MAX_RUNTIME_SEC,
+    )
+    deletion_queue.on_earlier_deadline = partial(scheduler.wake, "delete_checker")
+
+    scheduler.add_job(
+        "access_notify",
+        partial(notify_access, bot, db, TokenBucket(config.access_notify_rate_per_sec), config),
+        interval_sec=config.access_notify_interval_sec,
+        jitter_sec=config.job_jitter_sec,
+        max_runtime_sec=config.access_notify_interval_sec,
+    )
+
+    if db.journal_mode == "WAL" and config.db_checkpoint_interval_sec > 0:
+        scheduler.add_job(
+            "wal_checkpoint",
+            partial(checkpoint_wal, db, config),
+            interval_sec=config.db_checkpoint_interval_sec,
+            first_delay_sec=config.db_checkpoint_interval_sec,
+            jitter_sec=config.job_jitter_sec,
+            max_runtime_sec=config.db_checkpoint_interval_sec,
+        )
+
+    logger.info(
+        "Background jobs registered payment_interval=%ss payment_mode=%s deletions_pending=%s "
+        "access_notify_interval=%ss checkpoint_interval=%ss",
+        payment_interval,
+        config.payment_check_mode,
+        len(deletion_queue),
+        config.access_notify_interval_sec,
+        config.db_checkpoint_interval_sec,
+    )
+    scheduler.start()
+
+
+async def stop_background_tasks(scheduler: JobScheduler) -> None:
+    await scheduler.stop()
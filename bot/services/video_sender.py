@@ -6,11 +6,13 @@ from aiogram import Bot
 from bot.db.database import Database
 from bot.db.repository import add_sent_video
 from bot.services.access import compute_delete_after
+from bot.services.deletion_queue import DeletionQueue
 
 
 async def send_video_and_schedule(
     bot: Bot,
     db: Database,
+    deletion_queue: DeletionQueue,
     chat_id: int,
     user_id: int,
     file_id: str,
@@ -25,7 +27,8 @@ async def send_video_and_schedule(
     )
     message = await bot.send_video(chat_id=chat_id, video=file_id)
     delete_after = compute_delete_after(access_until)
-    await add_sent_video(db, user_id, chat_id, message.message_id, delete_after)
+    record_id = await add_sent_video(db, user_id, chat_id, message.message_id, delete_after)
+    deletion_queue.push(record_id, chat_id, message.message_id, delete_after)
     logger.info(
         "Sent video user_id=%s message_id=%s delete_after=%s",
         user_id,
@@ -0,0 +1,99 @@
+import hashlib
+import hmac
+import logging
+from typing import Mapping, Optional
+
+from aiogram import Bot
+from aiohttp import web
+
+from bot.db.database import Database
+from bot.db import repository
+from bot.services.payments import settle_payment
+
+
+# Order of the fields in the YooMoney notification signature; the secret goes
+# between ``codepro`` and ``label``.
+SIGNED_FIELDS = ("notification_type", "operation_id", "amount", "currency", "datetime", "sender", "codepro")
+
+
+def notification_hash(data: Mapping[str, str], secret: str) -> str:
+    parts = [str(data.get(field, "")) for field in SIGNED_FIELDS]
+    parts.extend([secret, str(data.get("label", ""))])
+    return hashlib.sha1("&".join(parts).encode("utf-8")).hexdigest()
+
+
+def verify_notification(data: Mapping[str, str], secret: str) -> bool:
+    received = str(data.get("sha1_hash", "")).lower()
+    return bool(received) and hmac.compare_digest(notification_hash(data, secret), received)
+
+
+class PaymentWebhook:
+    """HTTP endpoint for YooMoney incoming-payment notifications."""
+
+    def __init__(self, bot: Bot, db: Database, secret: str, host: str, port: int, path: str) -> None:
+        self._bot = bot
+        self._db = db
+        self._secret = secret
+        self._host = host
+        self._port = port
+        self._path = path
+        self._runner: Optional[web.AppRunner] = None
+        self._logger = logging.getLogger("payment_webhook")
+
+    @property
+    def address(self) -> Optional[tuple]:
+        if self._runner is None or not self._runner.addresses:
+            return None
+        return self._runner.addresses[0][:2]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        if not verify_notification(data, self._secret):
+            self._logger.warning("Rejected notification with bad signature operation_id=%s", data.get("operation_id"))
+            return web.Response(status=400)
+        label = data.get("label")
+        if data.get("codepro") == "true" or data.get("unaccepted") == "true" or not label:
+            self._logger.info(
+                "Ignored notification operation_id=%s label=%s codepro=%s unaccepted=%s",
+                data.get("operation_id"),
+                label,
+                data.get("codepro"),
+                data.get("unaccepted"),
+            )
+            return web.Response(text="OK")
+
+        payment = await repository.get_payment_by_label(self._db, label)
+        if payment is None or payment["status"] not in ("pending", "expired"):
+            self._logger.info("Notification for unknown or settled payment label=%s", label)
+            return web.Response(text="OK")
+        withdraw_amount = data.get("withdraw_amount")
+        try:
+            underpaid = withdraw_amount is not None and float(withdraw_amount) < int(payment["amount"])
+        except ValueError:
+            underpaid = True
+        if underpaid:
+            self._logger.warning(
+                "Notification amount mismatch label=%s paid=%s expected=%s",
+                label,
+                withdraw_amount,
+                payment["amount"],
+            )
+            return web.Response(text="OK")
+        await settle_payment(self._bot, self._db, payment)
+        return web.Response(text="OK")
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_post(self._path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        self._logger.info("Payment webhook listening on %s:%s%s", self._host, self._port, self._path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
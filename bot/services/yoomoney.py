@@ -1,20 +1,102 @@
+import asyncio
 import logging
-from typing import Optional
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 from urllib.parse import urlencode
 
 import aiohttp
 
+from bot.utils.rate_limit import TokenBucket
 
-PAYMENT_URL = "https://yoomoney.ru/quickpay/confirm.xml"
-HISTORY_URL = "https://yoomoney.ru/api/operation-history"
+
+DEFAULT_BASE_URL = "https://yoomoney.ru"
+PAYMENT_PATH = "/quickpay/confirm.xml"
+HISTORY_PATH = "/api/operation-history"
+HISTORY_PAGE_SIZE = 100
+
+
+@dataclass
+class TransportConfig:
+    total_timeout_sec: float = 15.0
+    connect_timeout_sec: float = 5.0
+    read_timeout_sec: float = 10.0
+    limit: int = 20
+    limit_per_host: int = 10
+    keepalive_timeout_sec: float = 30.0
+    dns_ttl_sec: int = 300
+    max_retries: int = 2
+    retry_backoff_sec: float = 0.5
+    breaker_threshold: int = 5
+    breaker_reset_sec: float = 30.0
+
+
+class CircuitBreaker:
+    """Sheds calls for ``reset_sec`` after ``threshold`` consecutive failures, then lets one trial through."""
+
+    def __init__(self, threshold: int, reset_sec: float) -> None:
+        self.threshold = threshold
+        self.reset_sec = reset_sec
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.threshold <= 0 or self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_sec:
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self.state = "closed"
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open" or (self.threshold > 0 and self._failures >= self.threshold):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def abandon(self) -> None:
+        """Forget a trial call that ended without a result; the next call becomes the trial."""
+        if self.state == "half_open":
+            self.state = "open"
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
 
 
 class YooMoneyClient:
-    def __init__(self, token: str, wallet: str) -> None:
+    def __init__(
+        self,
+        token: str,
+        wallet: str,
+        transport: Optional[TransportConfig] = None,
+        base_url: str = DEFAULT_BASE_URL,
+    ) -> None:
         self._token = token
         self._wallet = wallet
+        self._payment_url = base_url.rstrip("/") + PAYMENT_PATH
+        self._history_url = base_url.rstrip("/") + HISTORY_PATH
+        self._transport = transport or TransportConfig()
         self._session: Optional[aiohttp.ClientSession] = None
+        self._breaker = CircuitBreaker(self._transport.breaker_threshold, self._transport.breaker_reset_sec)
         self._logger = logging.getLogger("yoomoney")
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "shed": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        }
 
     @property
     def enabled(self) -> bool:
@@ -22,12 +104,39 @@ class YooMoneyClient:
 
     async def start(self) -> None:
         if self._session is None:
-            self._session = aiohttp.ClientSession()
+            transport = self._transport
+            connector = aiohttp.TCPConnector(
+                limit=transport.limit,
+                limit_per_host=transport.limit_per_host,
+                ttl_dns_cache=transport.dns_ttl_sec,
+                keepalive_timeout=transport.keepalive_timeout_sec,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=transport.total_timeout_sec,
+                connect=transport.connect_timeout_sec,
+                sock_read=transport.read_timeout_sec,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
 
     async def close(self) -> None:
         if self._session is not None:
             await self._session.close()
             self._session = None
+            self._logger.info("YooMoney client closed metrics=%s", self.metrics())
+
+    def metrics(self) -> dict:
+        completed = self.stats["successes"] + self.stats["failures"]
+        avg_latency = self.stats["latency_ms_total"] / completed if completed else 0.0
+        return {
+            **self.stats,
+            "latency_ms_avg": round(avg_latency, 1),
+            "breaker_state": self._breaker.state,
+        }
+
+    def _record_latency(self, started: float) -> None:
+        latency_ms = (time.monotonic() - started) * 1000
+        self.stats["latency_ms_total"] += latency_ms
+        self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], latency_ms)
 
     def build_payment_url(self, amount: int, label: str, description: str) -> str:
         params = {
@@ -38,27 +147,69 @@ class YooMoneyClient:
             "sum": str(amount),
             "label": label,
         }
-        url = f"{PAYMENT_URL}?{urlencode(params)}"
+        url = f"{self._payment_url}?{urlencode(params)}"
         self._logger.info("Built payment URL label=%s amount=%s", label, amount)
         self._logger.debug("Payment URL: %s", url)
         return url
 
-    async def check_payment(self, label: str) -> bool:
-        if not self.enabled:
-            return False
+    async def _post_history(self, data: dict, limiter: Optional[TokenBucket] = None) -> Optional[dict]:
         if self._session is None:
             raise RuntimeError("YooMoneyClient is not started")
+        if not self._breaker.allow():
+            self.stats["shed"] += 1
+            self._logger.debug("YooMoney circuit open, request shed")
+            return None
         headers = {"Authorization": f"Bearer {self._token}"}
-        data = {"label": label}
-        self._logger.debug("Checking YooMoney payment label=%s", label)
+        self.stats["requests"] += 1
+        started = time.monotonic()
+        recorded = False
         try:
-            async with self._session.post(HISTORY_URL, data=data, headers=headers) as resp:
-                if resp.status != 200:
-                    self._logger.warning("YooMoney status %s for label %s", resp.status, label)
-                    return False
-                payload = await resp.json()
-        except Exception:
-            self._logger.exception("Failed to check YooMoney payment")
+            for attempt in range(self._transport.max_retries + 1):
+                if attempt:
+                    self.stats["retries"] += 1
+                    delay = self._transport.retry_backoff_sec * 2 ** (attempt - 1)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                # One token per HTTP request, retries included.
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    async with self._session.post(self._history_url, data=data, headers=headers) as resp:
+                        if resp.status >= 500:
+                            raise _RetryableStatus(resp.status)
+                        if resp.status != 200:
+                            # 4xx is not retried, but still counts against the breaker.
+                            self._logger.warning("YooMoney status %s for history request %s", resp.status, data)
+                            break
+                        payload = await resp.json()
+                except (asyncio.TimeoutError, aiohttp.ClientError, _RetryableStatus) as exc:
+                    self._logger.warning("YooMoney request failed attempt=%s error=%r", attempt + 1, exc)
+                    continue
+                except Exception:
+                    self._logger.exception("Failed to query YooMoney operation history")
+                    break
+                self._record_latency(started)
+                self.stats["successes"] += 1
+                self._breaker.record_success()
+                recorded = True
+                return payload
+            self._record_latency(started)
+            self.stats["failures"] += 1
+            self._breaker.record_failure()
+            recorded = True
+            if self._breaker.state == "open":
+                self._logger.warning("YooMoney circuit opened for %ss", self._transport.breaker_reset_sec)
+            return None
+        finally:
+            if not recorded:
+                # Cancelled mid-request: a half-open breaker must not wait for this trial forever.
+                self._breaker.abandon()
+
+    async def check_payment(self, label: str, limiter: Optional[TokenBucket] = None) -> bool:
+        if not self.enabled:
+            return False
+        self._logger.debug("Checking YooMoney payment label=%s", label)
+        payload = await self._post_history({"label": label}, limiter)
+        if payload is None:
             return False
 
         for operation in payload.get("operations", []):
@@ -67,3 +218,32 @@ class YooMoneyClient:
                 return True
         self._logger.info("Payment not found or not success label=%s", label)
         return False
+
+    async def fetch_operations(
+        self,
+        since: str,
+        max_pages: int = 50,
+        limiter: Optional[TokenBucket] = None,
+    ) -> Optional[Tuple[List[dict], bool]]:
+        """Incoming operations since ``since`` and whether all pages were read; None on failure."""
+        if not self.enabled:
+            return [], True
+        operations: List[dict] = []
+        start_record: Optional[str] = None
+        for _ in range(max_pages):
+            data = {"type": "deposition", "from": since, "records": str(HISTORY_PAGE_SIZE)}
+            if start_record:
+                data["start_record"] = start_record
+            payload = await self._post_history(data, limiter)
+            if payload is None:
+                return None
+            operations.extend(payload.get("operations", []))
+            start_record = payload.get("next_record")
+            if not start_record:
+                complete = True
+                break
+        else:
+            complete = False
+            self._logger.warning("Operation history truncated after %s pages since=%s", max_pages, since)
+        self._logger.debug("Fetched YooMoney operations count=%s since=%s", len(operations), since)
+        return operations, complete
@@ -6,12 +6,16 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot.config.settings import load_settings
-from bot.db.database import Database
+from bot.db.database import Database, PragmaProfile
 from bot.db.schema import init_db
-from bot.db.repository import seed_videos
+from bot.db.repository import catalog_cache, load_settings_cache, seed_videos, settings_cache
 from bot.handlers import router as main_router
-from bot.services.scheduler import start_background_tasks, stop_background_tasks
-from bot.services.yoomoney import YooMoneyClient
+from bot.services.broadcast import BroadcastEngine
+from bot.services.deletion_queue import DeletionQueue
+from bot.services.payment_checks import PaymentCheckExecutor
+from bot.services.scheduler import JobScheduler, start_background_tasks, stop_background_tasks
+from bot.services.webhook import PaymentWebhook
+from bot.services.yoomoney import TransportConfig, YooMoneyClient
 from bot.utils.logger import setup_logging
 
 
@@ -19,45 +23,134 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot) -> None:
     config = dispatcher["config"]
     db = dispatcher["db"]
     yoomoney = dispatcher["yoomoney"]
+    payment_checks = dispatcher["payment_checks"]
 
+    await db.start()
     await yoomoney.start()
     await init_db(db)
     await seed_videos(db, config.video_file_ids)
-
-    tasks = start_background_tasks(bot, db, yoomoney, config)
-    dispatcher["tasks"] = tasks
+    await load_settings_cache(db)
+
+    if config.yoomoney_notify_secret:
+        webhook = PaymentWebhook(
+            bot,
+            db,
+            config.yoomoney_notify_secret,
+            config.webhook_host,
+            config.webhook_port,
+            config.webhook_path,
+        )
+        await webhook.start()
+        dispatcher["webhook"] = webhook
+
+    await dispatcher["broadcasts"].resume()
+
+    await start_background_tasks(
+        dispatcher["scheduler"],
+        bot,
+        db,
+        payment_checks,
+        dispatcher["deletion_queue"],
+        config,
+    )
 
 
 async def on_shutdown(dispatcher: Dispatcher, bot: Bot) -> None:
-    tasks = dispatcher.get("tasks", [])
-    await stop_background_tasks(tasks)
+    await stop_background_tasks(dispatcher["scheduler"])
+    await dispatcher["broadcasts"].stop()
+    webhook = dispatcher.get("webhook")
+    if webhook is not None:
+        await webhook.stop()
     yoomoney = dispatcher["yoomoney"]
     await yoomoney.close()
+    db = dispatcher["db"]
+    await db.close()
 
 
 async def main() -> None:
     config = load_settings()
     setup_logging(config.log_level)
 
-    db = Database(config.db_url)
-    yoomoney = YooMoneyClient(config.yoomoney_token, config.yoomoney_wallet)
+    catalog_cache.ttl_sec = config.catalog_cache_ttl_sec
+    settings_cache.version_check_sec = config.settings_version_check_sec
+
+    db = Database(
+        config.db_url,
+        pool_size=config.db_pool_size,
+        pragmas=PragmaProfile(
+            journal_mode=config.db_journal_mode,
+            synchronous=config.db_synchronous,
+            mmap_size=config.db_mmap_size,
+            cache_size_kb=config.db_cache_size_kb,
+            temp_store=config.db_temp_store,
+            busy_timeout_ms=config.db_busy_timeout_ms,
+        ),
+    )
+    yoomoney = YooMoneyClient(
+        config.yoomoney_token,
+        config.yoomoney_wallet,
+        transport=TransportConfig(
+            total_timeout_sec=config.yoomoney_timeout_sec,
+            connect_timeout_sec=config.yoomoney_connect_timeout_sec,
+            read_timeout_sec=config.yoomoney_read_timeout_sec,
+            limit=config.yoomoney_pool_limit,
+            limit_per_host=config.yoomoney_pool_limit_per_host,
+            keepalive_timeout_sec=config.yoomoney_keepalive_sec,
+            dns_ttl_sec=config.yoomoney_dns_ttl_sec,
+            max_retries=config.yoomoney_max_retries,
+            retry_backoff_sec=config.yoomoney_retry_backoff_sec,
+            breaker_threshold=config.yoomoney_breaker_threshold,
+            breaker_reset_sec=config.yoomoney_breaker_reset_sec,
+        ),
+        base_url=config.yoomoney_base_url,
+    )
+    payment_checks = PaymentCheckExecutor(
+        yoomoney,
+        max_concurrency=config.payment_check_concurrency,
+        rate_per_sec=config.yoomoney_rate_per_sec,
+        burst=config.yoomoney_rate_burst,
+    )
 
     bot = Bot(
         token=config.bot_token,
         default=DefaultBotProperties(parse_mode="HTML", protect_content=True),
     )
+    broadcasts = BroadcastEngine(
+        bot,
+        db,
+        rate_per_sec=config.broadcast_rate_per_sec,
+        workers=config.broadcast_workers,
+        per_chat_interval_sec=config.broadcast_per_chat_interval_sec,
+        progress_interval_sec=config.broadcast_progress_interval_sec,
+        chunk_size=config.broadcast_chunk_size,
+    )
+    deletion_queue = DeletionQueue()
+    scheduler = JobScheduler()
     dispatcher = Dispatcher(storage=MemoryStorage())
     dispatcher.include_router(main_router)
     dispatcher["config"] = config
     dispatcher["db"] = db
     dispatcher["yoomoney"] = yoomoney
+    dispatcher["payment_checks"] = payment_checks
+    dispatcher["broadcasts"] = broadcasts
+    dispatcher["deletion_queue"] = deletion_queue
+    dispatcher["scheduler"] = scheduler
 
     dispatcher.startup.register(on_startup)
     dispatcher.shutdown.register(on_shutdown)
 
     logging.getLogger("aiogram.event").setLevel(logging.INFO)
 
-    await dispatcher.start_polling(bot, db=db, config=config, yoomoney=yoomoney)
+    await dispatcher.start_polling(
+        bot,
+        db=db,
+        config=config,
+        yoomoney=yoomoney,
+        payment_checks=payment_checks,
+        broadcasts=broadcasts,
+        deletion_queue=deletion_queue,
+        scheduler=scheduler,
+    )
 
 
 if __name__ == "__main__":